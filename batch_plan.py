@@ -0,0 +1,168 @@
+"""Plan many lanes without the web UI.
+
+Reads lanes from CSV or JSONL (columns ``origin``, ``destination`` and
+optionally ``interval_km``, ``corridor_km``, ``lane_id``), plans them on a
+bounded thread pool and streams one result row per lane as soon as it
+finishes. Usage::
+
+    python batch_plan.py lanes.csv -o results.jsonl --workers 8 --osrm-rate 5
+    python batch_plan.py lanes.csv -o results.jsonl --graph .cache/graph   # offline, local router
+
+Lanes planned before (see ``lane_cache.py``) return their stored stop list
+without any routing call; ``--no-lane-cache`` always plans.
+``--metrics`` logs one JSON line with stage timings per lane to stderr;
+``--metrics-file`` also writes the totals in Prometheus text format.
+"""
+import argparse
+import csv
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import geocoding
+import lane_cache
+import metrics
+import pipeline
+from local_router import LocalGraphRouter
+from osrm_client import OSRMClient, OSRM_SERVER, set_default_client
+from planner import get_station_index, plan_lane
+from ratelimit import TokenBucket
+
+CSV_FIELDS = ["lane_id", "origin", "destination", "interval_km", "corridor_km", "status", "error",
+              "seconds", "cached", "distance_km", "stops", "gap_km"]
+
+
+def read_lanes(path):
+    """Yield lane dicts from a ``.csv`` or ``.jsonl`` file ("-" reads JSONL from stdin)."""
+    if path == "-":
+        f = sys.stdin
+    else:
+        f = open(path, newline="", encoding="utf-8")
+    try:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for n, row in enumerate(rows, 1):
+            yield {
+                "lane_id": row.get("lane_id") or str(n),
+                "origin": row["origin"],
+                "destination": row["destination"],
+                "interval_km": float(row.get("interval_km") or 250),
+                "corridor_km": float(row.get("corridor_km") or 100),
+            }
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class ResultWriter:
+    """Thread-safe JSONL/CSV writer that flushes every row."""
+
+    def __init__(self, f, fmt):
+        self.f = f
+        self.fmt = fmt
+        self._lock = threading.Lock()
+        if fmt == "csv":
+            self._csv = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+
+    def write(self, result):
+        with self._lock:
+            if self.fmt == "csv":
+                row = dict(result)
+                row["stops"] = "|".join(stop["name"] for stop in result.get("stops") or [])
+                row["gap_km"] = json.dumps(result.get("gap_km")) if result.get("gap_km") else ""
+                self._csv.writerow(row)
+            else:
+                self.f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            self.f.flush()
+
+
+def _plan(lane):
+    result = plan_lane(lane["origin"], lane["destination"], interval_km=lane["interval_km"],
+                       corridor_km=lane["corridor_km"])
+    result["lane_id"] = lane["lane_id"]
+    return result
+
+
+def run(lanes, writer, workers=4):
+    """Plan ``lanes`` with at most ``workers`` in flight; returns (ok, failed) counts."""
+    counts = {"ok": 0, "failed": 0}
+
+    def emit(futures):
+        for future in futures:
+            result = future.result()
+            writer.write(result)
+            counts["failed" if result["status"] == "error" else "ok"] += 1
+
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for lane in lanes:
+            # Houd het aantal openstaande lanes begrensd, ook bij grote invoerbestanden
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                emit(done)
+            pending.add(pool.submit(_plan, lane))
+        emit(wait(pending).done)
+    return counts["ok"], counts["failed"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan OG refuel stops for many lanes.")
+    parser.add_argument("input", help="lanes as .csv or .jsonl ('-' for JSONL on stdin)")
+    parser.add_argument("-o", "--output", default="-", help="results as .csv or .jsonl (default: JSONL on stdout)")
+    parser.add_argument("--workers", type=int, default=4, help="lanes planned concurrently")
+    parser.add_argument("--osrm-server", default=OSRM_SERVER)
+    parser.add_argument("--osrm-rate", type=float, default=5.0, help="max OSRM requests per second")
+    parser.add_argument("--osrm-concurrency", type=int, default=pipeline.PROVIDER_CONCURRENCY["osrm"],
+                        help="max OSRM requests in flight across all lanes")
+    parser.add_argument("--graph", help="route in-process on this graph (directory, .osm or edge-list .csv) "
+                                        "instead of OSRM")
+    parser.add_argument("--geocode-rate", type=float, default=1.0,
+                        help="max requests per second per geocoding provider")
+    parser.add_argument("--no-lane-cache", action="store_true",
+                        help="always plan, ignoring stop lists stored for earlier runs of the same lane")
+    parser.add_argument("--metrics", action="store_true", help="log per-lane stage timings as JSON to stderr")
+    parser.add_argument("--metrics-file", help="write Prometheus text-format totals to this file when done")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port while running")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    if args.metrics or args.metrics_file or args.metrics_port:
+        metrics.enable()
+    if args.metrics:
+        metrics.log_json(sys.stderr)
+    if args.metrics_port:
+        metrics.serve_prometheus(args.metrics_port)
+
+    if args.graph:
+        set_default_client(LocalGraphRouter.from_path(args.graph))
+    else:
+        set_default_client(OSRMClient(args.osrm_server, rate_limiter=TokenBucket(args.osrm_rate)))
+    pipeline.set_concurrency("osrm", args.osrm_concurrency)
+    if args.no_lane_cache:
+        lane_cache.set_lane_cache(None)
+    for provider in geocoding.PROVIDER_LIMITS:
+        geocoding.set_rate_limit(provider, args.geocode_rate)
+    get_station_index()
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        writer = ResultWriter(out, "csv" if args.output.endswith(".csv") else "jsonl")
+        t0 = time.perf_counter()
+        ok, failed = run(read_lanes(args.input), writer, workers=args.workers)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print("{} lanes gepland, {} mislukt in {:.1f} s".format(ok, failed, time.perf_counter() - t0), file=sys.stderr)
+    print("geocoding: " + json.dumps(geocoding.stats.report()), file=sys.stderr)
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
+    return 1 if failed and not ok else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""Route geometry transport and render benchmark.
+
+Compares the OSRM ``geojson`` and ``polyline6`` payloads for the same route
+(raw and gzip-compressed size, parse time) and the number of points that go
+to the map after zoom-dependent simplification. Uses a synthetic road-like
+route, so it runs without network access::
+
+    python benchmarks/bench_geometry.py --points 50000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map_render import DETAIL_ZOOMS, fit_zoom, simplify_for_zoom  # noqa: E402
+from route_geometry import decode_polyline, encode_polyline, route_length  # noqa: E402
+
+
+def synthetic_route(n_points, start=(11.97, 57.70), end=(9.19, 45.46), seed=0):
+    """Road-like ``[lon, lat]`` polyline: a smooth wandering line with ~6-decimal precision."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, n_points)
+    # Een paar lange bochten plus kleine afwijkingen per punt, zoals bij een echte weg
+    freqs = rng.uniform(1, 12, 6)
+    phases = rng.uniform(0, 2 * np.pi, 6)
+    amps = rng.uniform(0.02, 0.25, 6) / freqs
+    bends = (amps[:, None] * np.sin(2 * np.pi * freqs[:, None] * t + phases[:, None])).sum(axis=0)
+    jitter = rng.normal(0, 2e-5, (n_points, 2))
+    lon = start[0] + (end[0] - start[0]) * t + bends + jitter[:, 0]
+    lat = start[1] + (end[1] - start[1]) * t + 0.5 * bends[::-1] + jitter[:, 1]
+    return np.round(np.column_stack([lon, lat]), 6)
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(n_points):
+    route = synthetic_route(n_points)
+    geojson_body = json.dumps({"code": "Ok", "routes": [{"geometry": {
+        "type": "LineString", "coordinates": route.tolist()}}]})
+    polyline_body = json.dumps({"code": "Ok", "routes": [{"geometry": encode_polyline(route)}]})
+
+    def parse_geojson():
+        return np.asarray(json.loads(geojson_body)["routes"][0]["geometry"]["coordinates"], dtype=np.float64)
+
+    def parse_polyline():
+        return decode_polyline(json.loads(polyline_body)["routes"][0]["geometry"])
+
+    assert np.allclose(parse_geojson(), parse_polyline(), atol=1e-6)
+    zoom = fit_zoom(route)
+    simplified = {z: len(simplify_for_zoom(route, z)) for z in (zoom, zoom + DETAIL_ZOOMS, zoom + 4)}
+    return {
+        "points": n_points,
+        "route_km": round(route_length(route), 1),
+        "geojson_bytes": len(geojson_body),
+        "geojson_gzip_bytes": len(gzip.compress(geojson_body.encode())),
+        "polyline6_bytes": len(polyline_body),
+        "polyline6_gzip_bytes": len(gzip.compress(polyline_body.encode())),
+        "geojson_parse_ms": round(best_of(parse_geojson) * 1000, 2),
+        "polyline6_parse_ms": round(best_of(parse_polyline) * 1000, 2),
+        "fit_zoom": zoom,
+        "rendered_points_by_zoom": simplified,
+        "simplify_ms": round(best_of(lambda: simplify_for_zoom(route, zoom + DETAIL_ZOOMS)) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+", default=[5000, 20000, 50000])
+    args = parser.parse_args(argv)
+    for n in args.points:
+        print(json.dumps(run(n)))
+
+
+if __name__ == "__main__":
+    main()
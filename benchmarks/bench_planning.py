@@ -0,0 +1,235 @@
+"""Planning benchmark over recorded lanes.
+
+Replays OSRM responses and geocoder results from ``benchmarks/fixtures`` for
+a fixed set of lanes (short NL hops, Göteborg→Milano, France↔Germany) and
+plans each lane against the real station file and synthetic station sets.
+Every stage of :func:`planner.build_route_with_filtered_tankstations`, the
+final route and the distance totals are timed separately, and the number of
+geodesic distance calls is counted. Results are written as JSON::
+
+    python benchmarks/bench_planning.py -o bench.json
+    python benchmarks/bench_planning.py --baseline bench.json   # exit 1 on regression
+
+With network access, ``--record --osrm-server URL`` re-geocodes the lanes and
+records real OSRM answers for the real station set into the fixtures.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geocoding  # noqa: E402
+import metrics  # noqa: E402
+import pipeline  # noqa: E402
+import replay  # noqa: E402
+from osrm_client import OSRMClient, set_default_client  # noqa: E402
+from planner import build_route_with_filtered_tankstations, get_osrm_route  # noqa: E402
+from route_geometry import route_length  # noqa: E402
+from station_index import StationIndex  # noqa: E402
+from station_store import DEFAULT_SOURCE, StationStore  # noqa: E402
+
+DEFAULT_STATION_SETS = ["real", "synthetic-10000", "synthetic-50000"]
+# Gebied waarin synthetische stations liggen (lat_min, lat_max, lon_min, lon_max)
+SYNTHETIC_BBOX = (43.0, 60.0, -2.0, 18.0)
+# Tellers waarvan elke toename als regressie telt (deterministisch, geen meetruis)
+EXACT_COUNTERS = ("geodesic.calls", "geodesic.pairs")
+
+
+def synthetic_stations(n, seed=0):
+    """Store with ``n`` stations spread uniformly over :data:`SYNTHETIC_BBOX`."""
+    rng = np.random.default_rng(seed)
+    lat_min, lat_max, lon_min, lon_max = SYNTHETIC_BBOX
+    return StationStore.from_frame(pd.DataFrame({
+        "name": ["Synthetisch {}".format(i) for i in range(n)],
+        "lat": rng.uniform(lat_min, lat_max, n),
+        "lon": rng.uniform(lon_min, lon_max, n),
+    }))
+
+
+def load_station_set(name):
+    if name == "real":
+        return StationStore.from_file(DEFAULT_SOURCE)
+    if name.startswith("synthetic-"):
+        return synthetic_stations(int(name.split("-", 1)[1]))
+    raise ValueError("Onbekende stationsset: {!r}".format(name))
+
+
+def run_lane(lane, store, index):
+    """Plan one lane inside a metrics trace; returns ``(trace, plan)``."""
+    with metrics.trace("lane", lane=lane["name"]) as trace:
+        start, end = geocoding.geocode_many([lane["origin"], lane["destination"]])
+        waypoints, _, plan = build_route_with_filtered_tankstations(
+            start, end, store, interval_km=lane["interval_km"], corridor_km=lane["corridor_km"], index=index)
+        route_coords, direct_coords = pipeline.gather(
+            functools.partial(get_osrm_route, waypoints), functools.partial(get_osrm_route, [start, end]))
+        with metrics.span("distance_totals"):
+            route_length(route_coords, method="ellipsoidal")
+            route_length(direct_coords, method="ellipsoidal")
+    return trace, plan
+
+
+def bench_lane(lane, store, index, repeat):
+    traces = []
+    for _ in range(repeat):
+        trace, plan = run_lane(lane, store, index)
+        traces.append(trace.as_dict())
+    stage_names = sorted({name for t in traces for name in t["stages"]})
+    return {
+        "n_stations": len(store),
+        "total_s": round(statistics.median(t["seconds"] for t in traces), 6),
+        "total_min_s": round(min(t["seconds"] for t in traces), 6),
+        "stages": {
+            name: {
+                "median_s": round(statistics.median(t["stages"].get(name, {}).get("seconds", 0.0) for t in traces), 6),
+                "min_s": round(min(t["stages"].get(name, {}).get("seconds", 0.0) for t in traces), 6),
+                "calls": traces[0]["stages"].get(name, {}).get("calls", 0),
+            }
+            for name in stage_names
+        },
+        # Tellers zijn per herhaling gelijk; die van de eerste run volstaan
+        "counters": traces[0]["counters"],
+        "feasible": bool(plan.feasible) if plan is not None else None,
+        "stops": len(plan.stops) if plan is not None else None,
+    }
+
+
+def run(lanes, station_sets, repeat=5, client=None, keep_real_only=True):
+    client = client if client is not None else replay.ReplayOSRMClient()
+    set_default_client(client)
+    geocoding.set_cache(replay.GeocodeFixtureCache(lanes))
+    upstream, keep_synthetic = client.upstream, client.keep_synthetic
+    results, index_build = {}, {}
+    for set_name in station_sets:
+        store = load_station_set(set_name)
+        t0 = time.perf_counter()
+        index = StationIndex(store.lat, store.lon)
+        index_build[set_name] = round(time.perf_counter() - t0, 6)
+        # Opnemen alleen voor de echte stations; synthetische sets krijgen altijd synthetische matrices
+        if keep_real_only and set_name != "real":
+            client.upstream, client.keep_synthetic = None, False
+        else:
+            client.upstream, client.keep_synthetic = upstream, keep_synthetic
+        for lane in lanes:
+            results["{}/{}".format(set_name, lane["name"])] = bench_lane(lane, store, index, repeat)
+    client.upstream, client.keep_synthetic = upstream, keep_synthetic
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "fixture_sources": client.meta.get("responses_by_source", {}),
+            "replay": dict(client.replay_stats),
+        },
+        "index_build_s": index_build,
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.25, min_delta_s=0.002):
+    """Regression messages for ``current`` against ``baseline`` (empty when nothing regressed).
+
+    Latencies are compared on the best of the repeats, which is far less
+    noisy than the median. One regresses when it grows more than
+    ``threshold`` (relative) and more than ``min_delta_s`` (absolute, against
+    timer noise on tiny stages). Geodesic-call counters regress on any increase.
+    """
+    problems = []
+
+    def check_time(label, old, new):
+        if new - old > min_delta_s and new > old * (1 + threshold):
+            problems.append("{}: {:.4f} s -> {:.4f} s (+{:.0f}%)".format(label, old, new, (new / old - 1) * 100))
+
+    for key, old in baseline["results"].items():
+        new = current["results"].get(key)
+        if new is None:
+            continue
+        check_time(key + " total", old["total_min_s"], new["total_min_s"])
+        for stage, old_stage in old["stages"].items():
+            if stage in new["stages"]:
+                check_time("{} {}".format(key, stage), old_stage["min_s"], new["stages"][stage]["min_s"])
+        for counter in EXACT_COUNTERS:
+            if new["counters"].get(counter, 0) > old["counters"].get(counter, 0):
+                problems.append("{} {}: {} -> {}".format(
+                    key, counter, old["counters"].get(counter, 0), new["counters"].get(counter, 0)))
+    return problems
+
+
+def record_geocodes(lanes):
+    """Geocode every lane with the real providers (needs network); updates ``start``/``end`` in place."""
+    geocoding.set_cache(None)
+    for lane in lanes:
+        for field, target in (("origin", "start"), ("destination", "end")):
+            loc = geocoding.geocode_address(lane[field])
+            if loc is None:
+                raise SystemExit("Adres niet gevonden: {}".format(lane[field]))
+            lane[target] = [round(loc[0], 6), round(loc[1], 6)]
+    with open(replay.LANES_PATH, encoding="utf-8") as f:
+        fixture = json.load(f)
+    fixture["lanes"] = lanes
+    with open(replay.LANES_PATH, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark lane planning on recorded OSRM/geocoder fixtures.")
+    parser.add_argument("--stations", nargs="+", default=DEFAULT_STATION_SETS,
+                        help="station sets: 'real' and/or 'synthetic-N'")
+    parser.add_argument("--lanes", nargs="+", help="only these lane names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", default="-", help="results JSON (default: stdout)")
+    parser.add_argument("--baseline", help="earlier results JSON; exit 1 when this run regressed")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative latency growth")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore latency growth below this")
+    parser.add_argument("--record", action="store_true", help="re-geocode lanes and record missing OSRM answers")
+    parser.add_argument("--osrm-server", help="OSRM server for --record")
+    parser.add_argument("--keep-synthetic", action="store_true",
+                        help="store synthesized OSRM answers in the fixture (offline fixture build)")
+    args = parser.parse_args(argv)
+
+    lanes = replay.load_lanes()
+    if args.lanes:
+        lanes = [lane for lane in lanes if lane["name"] in args.lanes]
+    upstream = None
+    if args.record:
+        if not args.osrm_server:
+            parser.error("--record heeft --osrm-server nodig")
+        record_geocodes(lanes)
+        upstream = OSRMClient(args.osrm_server, cache_path=None)
+    client = replay.ReplayOSRMClient(upstream=upstream, keep_synthetic=args.keep_synthetic)
+
+    metrics.enable()
+    result = run(lanes, args.stations, repeat=args.repeat, client=client)
+    if args.record or args.keep_synthetic:
+        client.save()
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(baseline, result, threshold=args.threshold, min_delta_s=args.min_delta_ms / 1000)
+        for problem in problems:
+            print("REGRESSIE " + problem, file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
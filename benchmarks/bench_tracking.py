@@ -0,0 +1,108 @@
+"""Per-ping cost of the live along-route station lookup.
+
+Drives simulated vehicles along a synthetic road-like route with noisy GPS
+pings and measures :meth:`live_tracking.Fleet.ping` (map matching plus the
+stations ahead) per ping, and checks the matched offsets against the true
+ones. Runs without network access::
+
+    python benchmarks/bench_tracking.py --vehicles 500 --stations 50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_geometry import synthetic_route  # noqa: E402
+from live_tracking import Fleet, RouteTrack  # noqa: E402
+from route_geometry import cumulative_distance  # noqa: E402
+from station_index import StationIndex  # noqa: E402
+
+# Ongeveer 20 m per punt, zoals een OSRM-geometrie met overview=full
+ROUTE_POINTS = 60000
+# Snelheid en pinginterval van de gesimuleerde wagens; GPS-ruis in graden (~10 m)
+SPEED_KMH = 85.0
+PING_S = 5.0
+GPS_NOISE_DEG = 1e-4
+STATION_SPREAD_DEG = 1.0
+
+
+def pings_along(route, cum, start_km, n, rng):
+    """``n`` noisy ``(lat, lon)`` pings from ``start_km`` onwards, with their true offsets."""
+    offsets = np.minimum(start_km + np.arange(n) * SPEED_KMH * PING_S / 3600, cum[-1])
+    lon = np.interp(offsets, cum, route[:, 0]) + rng.normal(0, GPS_NOISE_DEG, n)
+    lat = np.interp(offsets, cum, route[:, 1]) + rng.normal(0, GPS_NOISE_DEG, n)
+    return list(zip(lat.tolist(), lon.tolist())), offsets
+
+
+def run(n_vehicles, n_pings, n_stations, ahead_km=100.0, limit=None, seed=0):
+    rng = np.random.default_rng(seed)
+    route = synthetic_route(ROUTE_POINTS)
+    cum = cumulative_distance(route)
+    # Stations ruim rond de route verspreid; een klein deel valt binnen de corridor
+    k = rng.integers(0, len(route), n_stations)
+    index = StationIndex(route[k, 1] + rng.normal(0, STATION_SPREAD_DEG, n_stations),
+                         route[k, 0] + rng.normal(0, STATION_SPREAD_DEG, n_stations))
+    t0 = time.perf_counter()
+    track = RouteTrack.from_stations(route, index, corridor_km=5.0, cum=cum)
+    build_s = time.perf_counter() - t0
+
+    fleet = Fleet()
+    traces = []
+    for v in range(n_vehicles):
+        fleet.start(v, track)
+        traces.append(pings_along(route, cum, rng.uniform(0, cum[-1] * 0.8), n_pings, rng))
+    # Eerste ping zoekt de hele route af; apart meten
+    t0 = time.perf_counter()
+    for v in range(n_vehicles):
+        fleet.ping(v, *traces[v][0][0])
+    first_s = (time.perf_counter() - t0) / n_vehicles
+
+    found = 0
+    t0 = time.perf_counter()
+    for i in range(1, n_pings):
+        for v in range(n_vehicles):
+            found += len(fleet.ping(v, *traces[v][0][i], within_km=ahead_km, limit=limit))
+    ping_s = (time.perf_counter() - t0) / (n_vehicles * (n_pings - 1))
+    errors = np.abs([fleet.session(v).offset_km - traces[v][1][-1] for v in range(n_vehicles)])
+
+    # Alleen de map-matching, op dezelfde pings nog eens vanaf het begin
+    sessions = [fleet.start(v, track) for v in range(n_vehicles)]
+    for v in range(n_vehicles):
+        sessions[v].update(*traces[v][0][0])
+    t0 = time.perf_counter()
+    for i in range(1, n_pings):
+        for v in range(n_vehicles):
+            sessions[v].update(*traces[v][0][i])
+    match_s = (time.perf_counter() - t0) / (n_vehicles * (n_pings - 1))
+    return {
+        "route_km": round(float(cum[-1]), 1),
+        "route_points": len(route),
+        "corridor_stations": len(track.offsets),
+        "track_build_ms": round(build_s * 1000, 2),
+        "first_ping_us": round(first_s * 1e6, 1),
+        "match_us": round(match_s * 1e6, 2),
+        "ping_us": round(ping_s * 1e6, 2),
+        "pings": n_vehicles * n_pings,
+        "mean_upcoming": round(found / (n_vehicles * (n_pings - 1)), 1),
+        "max_offset_error_m": round(float(errors.max()) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vehicles", type=int, default=200)
+    parser.add_argument("--pings", type=int, default=100, help="pings per vehicle")
+    parser.add_argument("--stations", type=int, default=10000)
+    parser.add_argument("--ahead-km", type=float, default=100.0)
+    parser.add_argument("--limit", type=int, help="max stations returned per ping")
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.vehicles, args.pings, args.stations, args.ahead_km, args.limit), indent=2))
+
+
+if __name__ == "__main__":
+    main()
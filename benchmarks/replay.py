@@ -0,0 +1,184 @@
+"""Recorded OSRM and geocoder responses for the benchmarks.
+
+:class:`ReplayOSRMClient` answers requests from a fixture file keyed exactly
+like the :class:`osrm_client.OSRMClient` cache. A request that is not in the
+fixture is either fetched from a real server (record mode) or synthesized
+deterministically: a road-like polyline for ``route`` and haversine-based
+matrices for ``table``. Synthesized answers are counted, so a benchmark run
+shows how much of it was replayed.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from osrm_client import OSRMClient  # noqa: E402
+from route_geometry import encode_polyline, haversine_km, route_length  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+LANES_PATH = os.path.join(FIXTURE_DIR, "lanes.json")
+OSRM_FIXTURE_PATH = os.path.join(FIXTURE_DIR, "osrm_responses.json.gz")
+
+# Synthetische routes: punt om de ~200 m, omweg- en snelheidsfactor voor wegen
+SYNTHETIC_STEP_KM = 0.2
+SYNTHETIC_ROAD_FACTOR = 1.25
+SYNTHETIC_SPEED_KMH = 85.0
+
+
+def load_lanes(path=LANES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["lanes"]
+
+
+class GeocodeFixtureCache:
+    """Stand-in for the geocode :class:`cache.DiskCache` holding the lanes' recorded coordinates.
+
+    Install with :func:`geocoding.set_cache`; lookups then go through the
+    normal geocoding code path and count as cache hits.
+    """
+
+    def __init__(self, lanes):
+        from geocoding import normalize_address
+        self._entries = {}
+        for lane in lanes:
+            for field, loc in (("origin", lane["start"]), ("destination", lane["end"])):
+                self._entries[normalize_address(lane[field])] = {"loc": list(loc), "at": float("inf")}
+
+    def get(self, key, ttl=None):
+        return self._entries.get(key)
+
+    def put(self, key, value):
+        pass
+
+
+def _seed(text):
+    return int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+
+
+def synthetic_leg(a, b, seed):
+    """Road-like ``[lon, lat]`` polyline from ``a`` to ``b`` (``(lat, lon)``), ending exactly on both."""
+    rng = np.random.default_rng(seed)
+    direct = float(haversine_km(a[0], a[1], b[0], b[1]))
+    n = max(2, int(direct * SYNTHETIC_ROAD_FACTOR / SYNTHETIC_STEP_KM))
+    t = np.linspace(0.0, 1.0, n)
+    # Bochten loodrecht op de rechte lijn, nul aan beide uiteinden
+    freqs = rng.uniform(1, 8, 4)
+    amps = rng.uniform(0.01, 0.05, 4) / freqs
+    bend = (amps[:, None] * np.sin(np.pi * freqs[:, None].round() * t)).sum(axis=0)
+    d_lat, d_lon = b[0] - a[0], b[1] - a[1]
+    lat = a[0] + d_lat * t - d_lon * bend
+    lon = a[1] + d_lon * t + d_lat * bend
+    inner = slice(1, n - 1)
+    lat[inner] += rng.normal(0, 2e-5, n - 2)
+    lon[inner] += rng.normal(0, 2e-5, n - 2)
+    return np.round(np.column_stack([lon, lat]), 6)
+
+
+def synthetic_response(service, waypoints, params, key):
+    """Deterministic OSRM-shaped answer for a request without a recording."""
+    if service == "route":
+        legs = [synthetic_leg(a, b, _seed(key) + i) for i, (a, b) in enumerate(zip(waypoints[:-1], waypoints[1:]))]
+        coords = np.concatenate([legs[0]] + [leg[1:] for leg in legs[1:]])
+        length_km = route_length(coords)
+        return {"code": "Ok", "routes": [{
+            "geometry": encode_polyline(coords),
+            "distance": round(length_km * 1000, 1),
+            "duration": round(length_km / SYNTHETIC_SPEED_KMH * 3600, 1),
+        }], "waypoints": [{"location": [round(lon, 6), round(lat, 6)]} for lat, lon in waypoints]}
+    if service == "table":
+        pts = np.asarray(waypoints, dtype=np.float64)
+        sources = [int(i) for i in params["sources"].split(";")] if "sources" in params else range(len(pts))
+        destinations = ([int(i) for i in params["destinations"].split(";")]
+                        if "destinations" in params else range(len(pts)))
+        src, dst = pts[list(sources)], pts[list(destinations)]
+        km = haversine_km(src[:, None, 0], src[:, None, 1], dst[None, :, 0], dst[None, :, 1]) * SYNTHETIC_ROAD_FACTOR
+        return {"code": "Ok",
+                "durations": np.round(km / SYNTHETIC_SPEED_KMH * 3600, 1).tolist(),
+                "distances": np.round(km * 1000, 1).tolist()}
+    raise ValueError("Geen synthetisch antwoord voor OSRM-service {!r}".format(service))
+
+
+class ReplayOSRMClient(OSRMClient):
+    """OSRM client that answers from a fixture file.
+
+    ``upstream`` (an :class:`OSRMClient`) turns on record mode: misses are
+    fetched from it and kept. ``keep_synthetic`` keeps synthesized answers
+    too, for building a fixture without network access. Call :meth:`save`
+    to write what was kept.
+    """
+
+    def __init__(self, path=OSRM_FIXTURE_PATH, upstream=None, keep_synthetic=False, **kwargs):
+        super().__init__(cache_path=None, **kwargs)
+        self.path = path
+        self.upstream = upstream
+        self.keep_synthetic = keep_synthetic
+        self.meta = {}
+        self.responses = {}
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                fixture = json.load(f)
+            self.meta = fixture.get("meta", {})
+            self.responses = fixture["responses"]
+        self._lock = threading.Lock()
+        self.replay_stats = {"replayed": 0, "recorded": 0, "synthesized": 0}
+        self._sources = dict(self.meta.get("sources", {}))
+
+    def _replay_count(self, name):
+        with self._lock:
+            self.replay_stats[name] += 1
+        metrics.count("replay." + name)
+
+    def request(self, service, waypoints, **params):
+        _, _, key = self._query(service, waypoints, params)
+        body = self.responses.get(key)
+        if body is not None:
+            self._replay_count("replayed")
+        elif self.upstream is not None:
+            data = self.upstream.request(service, waypoints, **params)
+            if data is None:
+                return None
+            body = json.dumps(data, separators=(",", ":"))
+            with self._lock:
+                self.responses[key] = body
+                self._sources[key] = "recorded"
+            self._replay_count("recorded")
+        else:
+            body = json.dumps(synthetic_response(service, waypoints, params, key), separators=(",", ":"))
+            if self.keep_synthetic:
+                with self._lock:
+                    self.responses[key] = body
+                    self._sources[key] = "synthetic"
+            self._replay_count("synthesized")
+        # Zoals bij een echt antwoord: de JSON-body parsen hoort bij de meting
+        metrics.count("osrm.bytes", len(body))
+        return json.loads(body)
+
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            sources = dict(self._sources)
+            counts = {}
+            for source in sources.values():
+                counts[source] = counts.get(source, 0) + 1
+            fixture = {
+                "meta": {
+                    "profile": self.profile,
+                    "precision": self.precision,
+                    "responses_by_source": counts,
+                    "sources": sources,
+                },
+                "responses": dict(sorted(self.responses.items())),
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        # mtime=0: dezelfde inhoud geeft byte-voor-byte hetzelfde bestand
+        with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            f.write(json.dumps(fixture, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        os.replace(tmp, path)
@@ -0,0 +1,131 @@
+"""Stations within a corridor around the actual route geometry.
+
+The route is split into chunks of consecutive segments, each with a bounding
+sphere. Only stations in grid cells near a chunk are considered, and only
+station/chunk pairs whose bounding spheres are close enough get an exact
+point-to-segment distance, so the cost stays low for long routes and large
+station sets.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from route_geometry import chord_to_arc_km, cumulative_distance, to_array, to_xyz_km
+
+# Segmenten per chunk; klein genoeg voor strakke bollen, groot genoeg voor weinig paren
+CHUNK_SEGMENTS = 32
+# Stations per blok bij de chunk-test, begrenst het geheugengebruik
+STATION_BLOCK = 2048
+
+
+class CorridorHits(NamedTuple):
+    """Stations within the corridor, ordered by position along the route."""
+
+    indices: np.ndarray  # index in de StationIndex
+    distance_km: np.ndarray  # afstand tot de route
+    offset_km: np.ndarray  # afstand vanaf de start, gemeten langs de route
+    segment: np.ndarray  # index van het dichtstbijzijnde routesegment
+
+
+def _empty_hits():
+    return CorridorHits(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64))
+
+
+def _xyz_to_latlon(xyz):
+    norm = np.linalg.norm(xyz, axis=-1)
+    lat = np.degrees(np.arcsin(np.clip(xyz[..., 2] / norm, -1.0, 1.0)))
+    lon = np.degrees(np.arctan2(xyz[..., 1], xyz[..., 0]))
+    return lat, lon
+
+
+def _nearest_segments(pts, block, centers, radii, corridor_km, starts, ends, seg_a, seg_ab, seg_len2):
+    """Closest segment per station/chunk pair for one block of stations."""
+    d = np.linalg.norm(pts[:, None, :] - centers[None, :, :], axis=2)
+    # Een chunk waarvan de ondergrens verder ligt dan de beste bovengrens kan het
+    # dichtstbijzijnde segment niet bevatten
+    upper = np.minimum((d + radii[None, :]).min(axis=1), corridor_km)
+    s, c = np.nonzero(d - radii[None, :] <= upper[:, None])
+
+    seg = starts[c][:, None] + np.arange(CHUNK_SEGMENTS)[None, :]
+    valid = seg < ends[c][:, None]
+    seg = np.where(valid, seg, ends[c][:, None] - 1)
+    ap = pts[s][:, None, :] - seg_a[seg]
+    ab = seg_ab[seg]
+    len2 = seg_len2[seg]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(len2 > 0, np.einsum("ijk,ijk->ij", ap, ab) / len2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    diff = ap - t[..., None] * ab
+    dist2 = np.einsum("ijk,ijk->ij", diff, diff)
+    dist2[~valid] = np.inf
+    best = np.argmin(dist2, axis=1) if len(s) else np.zeros(0, dtype=np.int64)
+    rows = np.arange(len(best))
+    return s + block, np.sqrt(dist2[rows, best]), seg[rows, best], t[rows, best]
+
+
+def stations_along_route(route, index, corridor_km, cum=None):
+    """Find all indexed stations within ``corridor_km`` of an OSRM ``[lon, lat]`` route.
+
+    ``cum`` is the route's cumulative-distance array, if the caller already
+    has it. Returns :class:`CorridorHits` sorted by along-route offset.
+    """
+    arr = to_array(route)
+    if len(arr) == 0 or len(index) == 0:
+        return _empty_hits()
+    if len(arr) == 1:
+        # Eén punt: een segment van lengte 0, met een bijpassende cum
+        arr = np.vstack([arr, arr])
+        cum = None
+    if cum is None:
+        cum = cumulative_distance(arr)
+
+    verts = to_xyz_km(arr[:, 1], arr[:, 0])
+    seg_a = verts[:-1]
+    seg_ab = verts[1:] - seg_a
+    seg_len2 = np.einsum("ij,ij->i", seg_ab, seg_ab)
+    n_seg = len(seg_a)
+
+    # Begrenzende bol per chunk (bevat ook de koorden tussen de hoekpunten)
+    starts = np.arange(0, n_seg, CHUNK_SEGMENTS)
+    ends = np.minimum(starts + CHUNK_SEGMENTS, n_seg)
+    counts = ends - starts + 1
+    centers = np.add.reduceat(verts[:-1], starts) + verts[ends]
+    centers /= counts[:, None]
+    vert_chunk = np.minimum(np.arange(len(verts)) // CHUNK_SEGMENTS, len(starts) - 1)
+    vert_dist = np.linalg.norm(verts - centers[vert_chunk], axis=1)
+    radii = np.maximum.reduceat(vert_dist, starts)
+    radii = np.maximum(radii, np.linalg.norm(verts[ends] - centers, axis=1))
+
+    center_lat, center_lon = _xyz_to_latlon(centers)
+    # Kleine marge voor het verschil tussen koorde en boog
+    candidates = index.candidates_near(center_lat, center_lon, chord_to_arc_km(radii) * 1.01 + corridor_km)
+    if len(candidates) == 0:
+        return _empty_hits()
+
+    station_xyz = to_xyz_km(index.lats[candidates], index.lons[candidates])
+    parts = [
+        _nearest_segments(station_xyz[block:block + STATION_BLOCK], block, centers, radii, corridor_km,
+                          starts, ends, seg_a, seg_ab, seg_len2)
+        for block in range(0, len(candidates), STATION_BLOCK)
+    ]
+    pair_station, pair_d, pair_seg, pair_t = (np.concatenate(col) for col in zip(*parts))
+    if len(pair_station) == 0:
+        return _empty_hits()
+
+    # Beste paar per station
+    order = np.lexsort((pair_d, pair_station))
+    _, first = np.unique(pair_station[order], return_index=True)
+    pick = order[first]
+    dist = chord_to_arc_km(pair_d[pick])
+    keep = dist <= corridor_km
+    pick, dist = pick[keep], dist[keep]
+    segment = pair_seg[pick]
+    offset = cum[segment] + pair_t[pick] * (cum[segment + 1] - cum[segment])
+
+    by_offset = np.argsort(offset, kind="stable")
+    return CorridorHits(
+        candidates[pair_station[pick]][by_offset],
+        dist[by_offset],
+        offset[by_offset],
+        segment[by_offset],
+    )
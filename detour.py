@@ -0,0 +1,76 @@
+"""Score candidate stops by the real driving detour they add.
+
+For a stretch of route from anchor ``a`` to anchor ``b``, the detour of a
+candidate ``c`` is ``a -> c -> b`` minus ``a -> b``. One OSRM ``/table`` call
+per chunk of candidates returns all of those legs at once, and the calls for
+different chunks and stretches run concurrently.
+"""
+import functools
+
+import numpy as np
+
+import pipeline
+
+# Kandidaten per table-aanvraag; houdt de URL kort en blijft ruim onder de
+# max-table-size (100) van de publieke OSRM-server
+TABLE_CHUNK = 50
+
+
+def _chunk_requests(anchor_before, anchor_after, candidates, chunk_size):
+    """``(lo, n, waypoints, sources, destinations)`` per table request for one stretch."""
+    requests = []
+    for lo in range(0, len(candidates), chunk_size):
+        chunk = list(candidates[lo:lo + chunk_size])
+        # Bronnen: a + kandidaten; bestemmingen: b + kandidaten
+        stops = list(range(2, 2 + len(chunk)))
+        requests.append((lo, len(chunk), [anchor_before, anchor_after] + chunk, [0] + stops, [1] + stops))
+    return requests
+
+
+def _run_tables(client, requests):
+    """All table requests at once (see :func:`pipeline.gather`); results in order, None for failures."""
+    return pipeline.gather(*(
+        functools.partial(client.table, waypoints, sources=sources, destinations=destinations)
+        for _, _, waypoints, sources, destinations in requests))
+
+
+def _apply(result, lo, n, duration, distance):
+    durations, distances = result
+    direct_s, direct_m = durations[0, 0], distances[0, 0]
+    via = slice(1, 1 + n)
+    duration[lo:lo + n] = durations[0, via] + durations[via, 0] - direct_s
+    distance[lo:lo + n] = (distances[0, via] + distances[via, 0] - direct_m) / 1000
+
+
+def score_along_route(client, route, cum, offsets_km, candidates, bin_km=50.0, chunk_size=TABLE_CHUNK):
+    """Detour of every corridor candidate, relative to the route stretch it lies on.
+
+    The route is cut into stretches of ``bin_km``; candidates on the same
+    stretch share its start and end point as anchors, so each stretch costs
+    one table request per chunk. The requests of all stretches run
+    concurrently. ``route`` is OSRM ``[lon, lat]`` geometry with cumulative
+    distances ``cum``; ``candidates`` are ``(lat, lon)`` points.
+    Returns ``(duration_s, distance_km)`` arrays with NaN where scoring failed.
+    """
+    offsets = np.asarray(offsets_km, dtype=np.float64)
+    duration = np.full(len(offsets), np.nan)
+    distance = np.full(len(offsets), np.nan)
+    if len(offsets) == 0:
+        return duration, distance
+    bins = np.floor(offsets / bin_km).astype(np.int64)
+    requests, owners = [], []
+    for b in np.unique(bins):
+        members = np.nonzero(bins == b)[0]
+        lo = max(int(np.searchsorted(cum, b * bin_km, side="right")) - 1, 0)
+        hi = min(int(np.searchsorted(cum, (b + 1) * bin_km, side="left")), len(route) - 1)
+        a, z = route[lo], route[hi]
+        for request in _chunk_requests((a[1], a[0]), (z[1], z[0]), [candidates[m] for m in members], chunk_size):
+            requests.append(request)
+            owners.append(members)
+    # Scores per stuk in tijdelijke arrays, dan terugschrijven naar de plaats van de kandidaten
+    for (lo, k, *_), members, result in zip(requests, owners, _run_tables(client, requests)):
+        if result is not None:
+            part_s, part_km = np.full(k, np.nan), np.full(k, np.nan)
+            _apply(result, 0, k, part_s, part_km)
+            duration[members[lo:lo + k]], distance[members[lo:lo + k]] = part_s, part_km
+    return duration, distance
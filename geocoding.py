@@ -0,0 +1,325 @@
+"""Address geocoding with Nominatim and a Photon fallback, without Streamlit.
+
+Results are kept in a persistent SQLite cache keyed by the normalized
+address, shared by every process on the machine. Addresses that no provider
+could find are cached too, with a shorter TTL. Provider calls go through one
+token bucket per provider, so concurrent callers together stay within the
+provider's usage policy.
+"""
+import functools
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from geopy.exc import GeocoderServiceError, GeocoderTimedOut, GeocoderUnavailable
+from geopy.geocoders import Nominatim, Photon
+
+import metrics
+import pipeline
+from cache import DiskCache
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+### Geocoding (robust) ###
+# Streamlit Cloud draait vaak achter gedeelde IP's; Nominatim (OSM) kan daardoor rate-limitten.
+# Daarom: 1) nette user-agent, 2) timeout, 3) rate limiting + retries, 4) caching, 5) fallback geocoder.
+NOMINATIM_UA = "streamlit-routeplanner"
+
+GEOCODER_ERRORS = (GeocoderUnavailable, GeocoderTimedOut, GeocoderServiceError)
+
+geolocator_osm = Nominatim(user_agent=NOMINATIM_UA, timeout=15)
+# Fallback: Photon (Komoot) – vaak wat toleranter op gedeelde IP's
+geolocator_photon = Photon(user_agent="og-routeplanner/1.0", timeout=15)
+
+# Eén bucket per provider, gedeeld door alle threads; Nominatim staat max. 1 verzoek/s toe
+PROVIDER_LIMITS = {
+    "nominatim": TokenBucket(1.0),
+    "photon": TokenBucket(1.0),
+}
+
+CACHE_PATH = os.environ.get(
+    "GEOCODE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "geocode.sqlite"))
+POSITIVE_TTL = 30 * 24 * 3600
+# Niet-gevonden adressen korter bewaren: OSM-data wordt bijgewerkt en providers kunnen tijdelijk falen
+NEGATIVE_TTL = 24 * 3600
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+class GeocodeStats:
+    """Thread-safe counters for cache hit rate and provider latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.lookups = 0
+            self.cache_hits = 0
+            self.negative_hits = 0
+            self.providers = {}
+
+    def hit(self, negative=False):
+        with self._lock:
+            self.lookups += 1
+            self.cache_hits += 1
+            self.negative_hits += negative
+        metrics.count("geocode.negative_hits" if negative else "geocode.cache_hits")
+
+    def miss(self):
+        with self._lock:
+            self.lookups += 1
+        metrics.count("geocode.misses")
+
+    def provider_call(self, provider, seconds, waited, error=False):
+        with self._lock:
+            p = self.providers.setdefault(provider, {"calls": 0, "errors": 0, "seconds": 0.0, "waited": 0.0})
+            p["calls"] += 1
+            p["errors"] += error
+            p["seconds"] += seconds
+            p["waited"] += waited
+
+    def report(self):
+        """Summary dict: hit rate and per-provider call count and mean latency."""
+        with self._lock:
+            providers = {
+                name: {
+                    "calls": p["calls"],
+                    "errors": p["errors"],
+                    "mean_latency_s": round(p["seconds"] / p["calls"], 4) if p["calls"] else None,
+                    "rate_limit_wait_s": round(p["waited"], 3),
+                }
+                for name, p in self.providers.items()
+            }
+            return {
+                "lookups": self.lookups,
+                "cache_hits": self.cache_hits,
+                "negative_hits": self.negative_hits,
+                "hit_rate": round(self.cache_hits / self.lookups, 4) if self.lookups else None,
+                "providers": providers,
+            }
+
+
+stats = GeocodeStats()
+
+
+class _NoCache:
+    def get(self, key, ttl=None):
+        return None
+
+    def put(self, key, value):
+        pass
+
+
+def get_cache():
+    """Process-wide geocode cache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache(CACHE_PATH, ttl=POSITIVE_TTL, max_entries=200000)
+        return _cache
+
+
+def set_cache(cache):
+    """Replace the geocode cache (a :class:`cache.DiskCache`, or None to disable caching)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache if cache is not None else _NoCache()
+    return _cache
+
+
+def set_rate_limit(provider, per_second):
+    """Change the request-rate cap for one provider."""
+    PROVIDER_LIMITS[provider] = TokenBucket(per_second)
+
+
+def normalize_address(address):
+    """Cache key form of an address: NFKC, lower case, single spaces, no stray punctuation."""
+    addr = unicodedata.normalize("NFKC", address or "").lower()
+    addr = re.sub(r"\s*,\s*", ", ", addr)
+    addr = re.sub(r"\s+", " ", addr)
+    return addr.strip(" ,.;")
+
+
+def _rate_limited(provider, geocode, query, max_retries=2, error_wait_seconds=2.0):
+    """Call ``geocode`` under the provider's concurrency limit and token bucket, retrying on errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            with pipeline.limit(provider):
+                waited = PROVIDER_LIMITS[provider].acquire()
+                metrics.count("geocode.rate_limit_wait_s", waited)
+                t0 = time.perf_counter()
+                with metrics.span("geocode." + provider):
+                    result = geocode(query)
+        except GEOCODER_ERRORS:
+            stats.provider_call(provider, time.perf_counter() - t0, waited, error=True)
+            if attempt == max_retries:
+                raise
+            time.sleep(error_wait_seconds)
+        else:
+            stats.provider_call(provider, time.perf_counter() - t0, waited)
+            return result
+
+
+def geocode_osm(addr):
+    return _rate_limited("nominatim", geolocator_osm.geocode, addr)
+
+
+def geocode_photon(addr):
+    return _rate_limited("photon", geolocator_photon.geocode, addr)
+
+
+def _lookup_providers(addr):
+    """``((lat, lon) or None, answered)`` from Nominatim, then Photon.
+
+    ``answered`` is False when every provider failed with an error, so the
+    caller does not cache a "not found" that was really an outage.
+    """
+    answered = False
+    # Try Nominatim first
+    try:
+        loc = geocode_osm(addr)
+        answered = True
+        if loc:
+            return (loc.latitude, loc.longitude), True
+    except GEOCODER_ERRORS as e:
+        # Dit komt in de Streamlit logs (Manage app → Logs).
+        logger.warning("Nominatim geocoding error: %r", e)
+
+    # Fallback to Photon
+    try:
+        loc = geocode_photon(addr)
+        answered = True
+        if loc:
+            return (loc.latitude, loc.longitude), True
+    except GEOCODER_ERRORS as e:
+        logger.warning("Photon geocoding error: %r", e)
+
+    return None, answered
+
+
+def _parse_latlon(addr):
+    m = re.match(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$", addr)
+    if m:
+        return (float(m.group(1)), float(m.group(2)))
+    return None
+
+
+def _cached(key):
+    """``(found, result)`` from the cache, honouring the shorter TTL for negatives."""
+    entry = get_cache().get(key)
+    if entry is None:
+        return False, None
+    if entry["loc"] is None:
+        if time.time() - entry["at"] > NEGATIVE_TTL:
+            return False, None
+        stats.hit(negative=True)
+        return True, None
+    stats.hit()
+    return True, tuple(entry["loc"])
+
+
+@metrics.traced("geocode")
+def geocode_address(address: str):
+    """Return (lat, lon) of None. Supports 'lat,lon' input."""
+    addr = (address or "").strip()
+    if not addr:
+        return None
+
+    # Support direct lat,lon input as fallback
+    latlon = _parse_latlon(addr)
+    if latlon:
+        return latlon
+
+    key = normalize_address(addr)
+    found, result = _cached(key)
+    if found:
+        return result
+    stats.miss()
+    result, answered = _lookup_providers(addr)
+    if answered:
+        get_cache().put(key, {"loc": list(result) if result else None, "at": time.time()})
+    return result
+
+
+def _reverse_label(raw):
+    """Short station label ("Parkweg 85, Utrecht") from a Nominatim or Photon reverse result."""
+    # Nominatim: raw["address"]; Photon: raw["properties"]
+    parts = raw.get("address") or raw.get("properties") or {}
+    street = parts.get("road") or parts.get("street") or parts.get("name") or ""
+    number = parts.get("house_number") or parts.get("housenumber") or ""
+    place = (parts.get("city") or parts.get("town") or parts.get("village")
+             or parts.get("municipality") or parts.get("county") or "")
+    label = " ".join(p for p in (street, number) if p)
+    return ", ".join(p for p in (label, place) if p) or None
+
+
+def reverse_geocode(lat, lon):
+    """Short address label for a position (Nominatim, then Photon), or None.
+
+    Results are cached like forward lookups, keyed by the position rounded to ~1 m.
+    """
+    key = "reverse:{:.5f},{:.5f}".format(lat, lon)
+    entry = get_cache().get(key)
+    if entry is not None and (entry["label"] is not None or time.time() - entry["at"] <= NEGATIVE_TTL):
+        stats.hit(negative=entry["label"] is None)
+        return entry["label"]
+    stats.miss()
+    label, answered = None, False
+    for provider, geolocator in (("nominatim", geolocator_osm), ("photon", geolocator_photon)):
+        try:
+            loc = _rate_limited(provider, geolocator.reverse, (lat, lon))
+        except GEOCODER_ERRORS as e:
+            logger.warning("%s reverse geocoding error: %r", provider, e)
+            continue
+        answered = True
+        label = _reverse_label(loc.raw) if loc else None
+        if label:
+            break
+    if answered:
+        get_cache().put(key, {"label": label, "at": time.time()})
+    return label
+
+
+@metrics.traced("geocode_many")
+def geocode_many(addresses):
+    """Geocode a list of addresses; returns results in input order.
+
+    Duplicate addresses (after normalization) are looked up once and cache
+    hits are served without touching a provider. Misses are looked up
+    concurrently (:func:`pipeline.gather`); the per-provider concurrency
+    limits and token buckets set the actual request rate, so a Photon
+    fallback can proceed while Nominatim is throttled.
+    """
+    unique = {}
+    for address in addresses:
+        addr = (address or "").strip()
+        unique.setdefault(normalize_address(addr), addr)
+
+    results = {}
+    misses = []
+    for key, addr in unique.items():
+        if not addr:
+            results[key] = None
+            continue
+        latlon = _parse_latlon(addr)
+        if latlon:
+            results[key] = latlon
+            continue
+        found, result = _cached(key)
+        if found:
+            results[key] = result
+        else:
+            misses.append((key, addr))
+
+    if misses:
+        found = pipeline.gather(*(functools.partial(geocode_address, addr) for _, addr in misses))
+        for (key, _), result in zip(misses, found):
+            results[key] = result
+    return [results[normalize_address((address or "").strip())] for address in addresses]
@@ -0,0 +1,92 @@
+"""Cache of planned stop lists for lanes that are run again and again.
+
+A lane is keyed by the grid cells (~1 km) of its geocoded origin and
+destination plus the planning parameters and the routing backend, so the
+daily lanes of a batch return their previous stop list without any OSRM
+call. Entries belong to one station dataset version
+(:attr:`station_store.StationStore.cache_version`); when that changes, the
+whole cache is cleared.
+"""
+import math
+import os
+import threading
+
+from cache import DiskCache
+
+LANE_CACHE_PATH = os.environ.get(
+    "LANE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "lanes.sqlite"))
+# Rastergrootte voor herkomst en bestemming: 0.01° is ~1 km
+GRID_DEG = 0.01
+LANE_TTL = 30 * 24 * 3600
+_VERSION_KEY = "__station_version__"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def grid_cell(point, grid_deg=GRID_DEG):
+    lat, lon = point
+    return math.floor(lat / grid_deg), math.floor(lon / grid_deg)
+
+
+class LaneCache:
+    """Stop lists per lane in a :class:`cache.DiskCache`, tied to one station dataset version."""
+
+    def __init__(self, path=LANE_CACHE_PATH, grid_deg=GRID_DEG, ttl=LANE_TTL, max_entries=50000):
+        self.grid_deg = grid_deg
+        self.disk = DiskCache(path, ttl=ttl, max_entries=max_entries)
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        with self._lock:
+            if self._version == version:
+                return
+            stored = self.disk.get(_VERSION_KEY, ttl=math.inf)
+            if stored is not None and stored != version:
+                # Ander stationsbestand (of opnieuw voorberekend): oude stoplijsten kloppen niet meer
+                self.disk.clear()
+            if stored != version:
+                self.disk.put(_VERSION_KEY, version)
+            self._version = version
+
+    def key(self, start, end, version, **params):
+        """Cache key: dataset version, origin and destination cells plus the sorted parameters."""
+        parts = [version, "{},{}".format(*grid_cell(start, self.grid_deg)),
+                 "{},{}".format(*grid_cell(end, self.grid_deg))]
+        parts += ["{}={}".format(name, params[name]) for name in sorted(params)]
+        return "|".join(parts)
+
+    def get(self, start, end, version, **params):
+        """The stored value for this lane, or None."""
+        self._check_version(version)
+        return self.disk.get(self.key(start, end, version, **params))
+
+    def put(self, start, end, version, value, **params):
+        self._check_version(version)
+        self.disk.put(self.key(start, end, version, **params), value)
+
+
+class _NoCache:
+    def get(self, start, end, version, **params):
+        return None
+
+    def put(self, start, end, version, value, **params):
+        pass
+
+
+def get_lane_cache():
+    """Process-wide lane cache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LaneCache()
+        return _cache
+
+
+def set_lane_cache(cache):
+    """Replace the lane cache (a :class:`LaneCache`, or None to disable it)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache if cache is not None else _NoCache()
+    return _cache
@@ -0,0 +1,218 @@
+"""Upcoming stations for vehicles driving a planned route, from live GPS pings.
+
+A :class:`RouteTrack` is built once per planned route and shared by every
+vehicle on it: the route segments as cartesian vectors (plain Python tuples,
+which are faster than NumPy scalars for the few segments a ping looks at)
+and the corridor stations sorted by their offset along the route.
+
+A :class:`VehicleSession` keeps the last matched segment. Each ping is
+projected onto the segments from there onwards, stopping as soon as the
+match can no longer improve, so a ping costs a few microseconds regardless
+of route length. The stations ahead are then two bisections in the sorted
+offsets. Only when the vehicle is not found near its last position (a long
+gap between pings, or a detour) is the whole route searched, vectorized.
+:class:`Fleet` keeps the sessions of many vehicles in one process.
+"""
+import bisect
+import math
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from corridor import stations_along_route
+from route_geometry import EARTH_RADIUS_KM, cumulative_distance, to_array, to_xyz_km
+
+# Standaard zoekafstand voor stations vooruit en breedte van de corridor rond de route
+DEFAULT_AHEAD_KM = 100.0
+DEFAULT_CORRIDOR_KM = 5.0
+# Verder dan dit van de route: de wagen rijdt niet (meer) op de geplande route
+MAX_OFF_ROUTE_KM = 0.5
+# Zoveel route voorbij de beste match nog bekijken voordat de lokale zoektocht stopt
+MATCH_SLACK_KM = 0.1
+# Segmenten terug vanaf de vorige match, voor GPS-ruis rond een hoekpunt
+BACK_SEGMENTS = 2
+
+
+class UpcomingStation(NamedTuple):
+    """A corridor station ahead of the vehicle."""
+
+    index: int  # rij in de StationStore
+    ahead_km: float  # afstand langs de route vanaf de wagen
+    distance_km: float  # afstand van het station tot de route
+
+
+class RouteTrack:
+    """Segments and sorted station offsets of one planned route, shared by all its vehicles.
+
+    ``route`` is OSRM ``[lon, lat]`` geometry with cumulative distances
+    ``cum`` (computed when omitted). ``hits`` are the
+    :class:`corridor.CorridorHits` of the stations to report, ordered by
+    offset; :meth:`from_lane` reuses those of a :class:`planner.LanePlan`.
+    """
+
+    def __init__(self, route, hits, cum=None):
+        arr = to_array(route)
+        if len(arr) < 2:
+            raise ValueError("Een route heeft minstens twee punten nodig")
+        cum = cumulative_distance(arr) if cum is None else np.asarray(cum, dtype=np.float64)
+        xyz = to_xyz_km(arr[:, 1], arr[:, 0])
+        a, ab = xyz[:-1], xyz[1:] - xyz[:-1]
+        len2 = np.einsum("ij,ij->i", ab, ab)
+        self.length_km = float(cum[-1])
+        self._xyz, self._ab, self._len2, self._cum = xyz, ab, len2, cum
+        # Per segment: begin, richting, lengte² (koorde), afstand langs de route bij het begin en de lengte
+        self._segments = list(zip(*(a[:, k].tolist() for k in range(3)), *(ab[:, k].tolist() for k in range(3)),
+                                  len2.tolist(), cum[:-1].tolist(), np.diff(cum).tolist()))
+        order = np.argsort(hits.offset_km, kind="stable")
+        self.offsets = hits.offset_km[order].tolist()
+        self.stations = hits.indices[order].tolist()
+        self.distance_km = hits.distance_km[order].tolist()
+
+    @classmethod
+    def from_stations(cls, route, index, corridor_km=DEFAULT_CORRIDOR_KM, cum=None):
+        """Track over the stations of a :class:`station_index.StationIndex` within ``corridor_km``."""
+        arr = to_array(route)
+        cum = cumulative_distance(arr) if cum is None else cum
+        return cls(arr, stations_along_route(arr, index, corridor_km, cum=cum), cum=cum)
+
+    @classmethod
+    def from_lane(cls, lane, corridor_km=DEFAULT_CORRIDOR_KM):
+        """Track over a planned :class:`planner.LanePlan`, reusing its geometry and corridor hits."""
+        return cls(lane.route, lane.candidates(corridor_km), cum=lane.cum)
+
+    def __len__(self):
+        return len(self._segments)
+
+    def match_local(self, x, y, z, segment):
+        """``(distance_km, segment, offset_km)`` of the best projection from ``segment`` onwards."""
+        segments = self._segments
+        best_d2, best_seg, best_off = math.inf, segment, 0.0
+        stop_km = math.inf
+        for i in range(max(segment - BACK_SEGMENTS, 0), len(segments)):
+            ax, ay, az, abx, aby, abz, len2, start_km, seg_km = segments[i]
+            if start_km > stop_km:
+                break
+            px, py, pz = x - ax, y - ay, z - az
+            t = (px * abx + py * aby + pz * abz) / len2 if len2 > 0 else 0.0
+            t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+            dx, dy, dz = px - t * abx, py - t * aby, pz - t * abz
+            d2 = dx * dx + dy * dy + dz * dz
+            if d2 < best_d2:
+                best_d2, best_seg, best_off = d2, i, start_km + t * seg_km
+                # Verder dan de huidige afstand voorbij de match kan een segment niet dichterbij
+                # liggen zonder terug te buigen; een stuk extra marge vangt bochten op
+                stop_km = best_off + math.sqrt(d2) + MATCH_SLACK_KM
+        return math.sqrt(best_d2), best_seg, best_off
+
+    def match_global(self, x, y, z):
+        """``(distance_km, segment, offset_km)`` of the best projection on the whole route."""
+        p = np.array([x, y, z]) - self._xyz[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(self._len2 > 0, np.einsum("ij,ij->i", p, self._ab) / self._len2, 0.0), 0.0, 1.0)
+        diff = p - t[:, None] * self._ab
+        d2 = np.einsum("ij,ij->i", diff, diff)
+        i = int(np.argmin(d2))
+        offset = self._cum[i] + t[i] * (self._cum[i + 1] - self._cum[i])
+        return math.sqrt(d2[i]), i, float(offset)
+
+    def ahead(self, offset_km, within_km=DEFAULT_AHEAD_KM, limit=None):
+        """Stations with an offset in ``(offset_km, offset_km + within_km]``, nearest first.
+
+        Two bisections find the range; ``limit`` caps the number returned.
+        """
+        lo = bisect.bisect_right(self.offsets, offset_km)
+        hi = bisect.bisect_right(self.offsets, offset_km + within_km, lo)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return [UpcomingStation(self.stations[k], self.offsets[k] - offset_km, self.distance_km[k])
+                for k in range(lo, hi)]
+
+
+class VehicleSession:
+    """Position of one vehicle along a :class:`RouteTrack`, updated ping by ping."""
+
+    def __init__(self, track, max_off_route_km=MAX_OFF_ROUTE_KM):
+        self.track = track
+        self.max_off_route_km = max_off_route_km
+        self.segment = 0
+        self.offset_km = 0.0
+        self.off_route_km = 0.0
+        self.on_route = True
+        self.matched = False
+        self.last_seen = time.monotonic()
+
+    def update(self, lat, lon):
+        """Match a GPS position; returns the offset along the route (km), or None when off the route.
+
+        Off the route the last matched offset is kept, so :meth:`upcoming`
+        still answers from where the vehicle left the route.
+        """
+        self.last_seen = time.monotonic()
+        la, lo = math.radians(lat), math.radians(lon)
+        cos_la = math.cos(la)
+        x = EARTH_RADIUS_KM * cos_la * math.cos(lo)
+        y = EARTH_RADIUS_KM * cos_la * math.sin(lo)
+        z = EARTH_RADIUS_KM * math.sin(la)
+        dist = math.inf
+        if self.matched:
+            dist, segment, offset = self.track.match_local(x, y, z, self.segment)
+        if dist > self.max_off_route_km:
+            # Eerste ping, lang geen ping of een omweg: de hele route doorzoeken
+            dist, segment, offset = self.track.match_global(x, y, z)
+        self.off_route_km = dist
+        self.on_route = dist <= self.max_off_route_km
+        if not self.on_route:
+            return None
+        self.segment, self.offset_km, self.matched = segment, offset, True
+        return offset
+
+    def upcoming(self, within_km=DEFAULT_AHEAD_KM, limit=None):
+        """Stations ahead within ``within_km`` along the route, nearest first (at most ``limit``)."""
+        return self.track.ahead(self.offset_km, within_km, limit)
+
+    @property
+    def remaining_km(self):
+        return self.track.length_km - self.offset_km
+
+
+class Fleet:
+    """Vehicle sessions of a whole fleet, by vehicle id; safe to use from several threads."""
+
+    def __init__(self, max_off_route_km=MAX_OFF_ROUTE_KM):
+        self.max_off_route_km = max_off_route_km
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def start(self, vehicle_id, track):
+        """(Re)start tracking ``vehicle_id`` on ``track``; returns its :class:`VehicleSession`."""
+        session = VehicleSession(track, max_off_route_km=self.max_off_route_km)
+        with self._lock:
+            self._sessions[vehicle_id] = session
+        return session
+
+    def stop(self, vehicle_id):
+        with self._lock:
+            self._sessions.pop(vehicle_id, None)
+
+    def session(self, vehicle_id):
+        return self._sessions.get(vehicle_id)
+
+    def ping(self, vehicle_id, lat, lon, within_km=DEFAULT_AHEAD_KM, limit=None):
+        """Update a vehicle and return the stations ahead of it; KeyError for unknown vehicles."""
+        session = self._sessions[vehicle_id]
+        session.update(lat, lon)
+        return session.upcoming(within_km, limit)
+
+    def expire(self, max_idle_s):
+        """Drop sessions without a ping for ``max_idle_s`` seconds; returns their vehicle ids."""
+        cutoff = time.monotonic() - max_idle_s
+        with self._lock:
+            idle = [vid for vid, s in self._sessions.items() if s.last_seen < cutoff]
+            for vid in idle:
+                del self._sessions[vid]
+        return idle
@@ -0,0 +1,420 @@
+"""In-process road router for offline planning.
+
+A :class:`RoadGraph` keeps the road network as compact CSR arrays: node
+coordinates plus forward and reverse adjacency with travel time (s) and
+length (m) per edge. It is built from an OSM XML extract or a CSV edge list
+and stored as ``.npy`` files that are memory-mapped on later starts, like the
+station snapshot.
+
+:class:`LocalGraphRouter` answers the same ``route``/``route_legs``/``table``/``nearest`` calls as
+:class:`osrm_client.OSRMClient`: routes with bidirectional A* (a straight-line
+travel-time bound as potential), matrices with one-to-many Dijkstra searches.
+Usage::
+
+    python local_router.py build netherlands.osm.bz2 -o .cache/graph
+    ROUTING_BACKEND=local:.cache/graph streamlit run app.py
+"""
+import bz2
+import gzip
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from route_geometry import haversine_km, to_xyz_km
+from station_index import StationIndex
+
+GRAPH_FORMAT = 1
+
+# Standaardsnelheden (km/h) per OSM highway-type als er geen maxspeed is
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 110, "motorway_link": 60,
+    "trunk": 90, "trunk_link": 50,
+    "primary": 70, "primary_link": 45,
+    "secondary": 60, "secondary_link": 40,
+    "tertiary": 50, "tertiary_link": 35,
+    "unclassified": 40, "residential": 30, "road": 30,
+    "living_street": 10, "service": 15,
+}
+_NO_ACCESS = {"no", "private"}
+# Verder dan dit van het wegennet kan een punt niet aan de graaf worden gekoppeld
+MAX_SNAP_KM = 5.0
+
+_ARRAYS = ("lat", "lon", "fwd_indptr", "fwd_head", "fwd_duration", "fwd_length",
+           "bwd_indptr", "bwd_head", "bwd_duration", "bwd_length")
+
+
+def _csr(tail, head, duration, length, n_nodes):
+    order = np.argsort(tail, kind="stable")
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tail, minlength=n_nodes), out=indptr[1:])
+    return (indptr, head[order].astype(np.int32), duration[order].astype(np.float32),
+            length[order].astype(np.float32))
+
+
+def _parse_maxspeed(value):
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*(mph)?", value or "")
+    if not m:
+        return None
+    speed = float(m.group(1))
+    return speed * 1.609344 if m.group(2) else speed
+
+
+def _open_text(path):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+class RoadGraph:
+    """Directed road graph in CSR form; node ``i`` is at ``(lat[i], lon[i])``.
+
+    ``version`` is a hash of the arrays, so two different graphs never share
+    cache entries; :meth:`write` stores it in ``meta.json`` so opening a
+    graph does not hash it again.
+    """
+
+    def __init__(self, arrays, max_speed_kmh, version=None):
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.max_speed_kmh = float(max_speed_kmh)
+        if version is None:
+            digest = hashlib.sha1(repr(self.max_speed_kmh).encode("ascii"))
+            for name in _ARRAYS:
+                digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+            version = digest.hexdigest()[:16]
+        self.version = version
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def n_edges(self):
+        return len(self.fwd_head)
+
+    @classmethod
+    def from_edges(cls, lats, lons, tail, head, speed_kmh, oneway=None):
+        """Build from node coordinates and edges ``tail[k] -> head[k]``.
+
+        Edge length is the great-circle distance between its nodes; edges that
+        are not ``oneway`` are added in both directions.
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        tail = np.asarray(tail, dtype=np.int64)
+        head = np.asarray(head, dtype=np.int64)
+        speed = np.broadcast_to(np.asarray(speed_kmh, dtype=np.float64), tail.shape)
+        oneway = np.zeros(len(tail), dtype=bool) if oneway is None else np.asarray(oneway, dtype=bool)
+        keep = (tail != head) & (speed > 0)
+        tail, head, speed, oneway = tail[keep], head[keep], speed[keep], oneway[keep]
+        length_m = haversine_km(lats[tail], lons[tail], lats[head], lons[head]) * 1000.0
+        duration_s = length_m / (speed / 3.6)
+        both = ~oneway
+        t = np.concatenate([tail, head[both]])
+        h = np.concatenate([head, tail[both]])
+        d = np.concatenate([duration_s, duration_s[both]])
+        m = np.concatenate([length_m, length_m[both]])
+        fwd = _csr(t, h, d, m, len(lats))
+        bwd = _csr(h, t, d, m, len(lats))
+        arrays = dict(zip(_ARRAYS, (lats, lons) + fwd + bwd))
+        return cls(arrays, float(speed.max()) if len(speed) else 1.0)
+
+    @classmethod
+    def from_edge_csv(cls, path):
+        """Edge list with ``from_lat, from_lon, to_lat, to_lon`` and optional ``speed_kmh``, ``oneway``.
+
+        Endpoints with the same coordinates (to 1e-7 degree) become one node.
+        """
+        df = pd.read_csv(path)
+        missing = {"from_lat", "from_lon", "to_lat", "to_lon"} - set(df.columns)
+        if missing:
+            raise ValueError("Ontbrekende kolommen in edge-lijst: {}".format(", ".join(sorted(missing))))
+        ends = np.concatenate([df[["from_lat", "from_lon"]].to_numpy(), df[["to_lat", "to_lon"]].to_numpy()])
+        nodes, inverse = np.unique(np.round(ends * 1e7).astype(np.int64), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        n = len(df)
+        speed = df["speed_kmh"].to_numpy(dtype=np.float64) if "speed_kmh" in df else 50.0
+        oneway = df["oneway"].fillna(0).astype(bool).to_numpy() if "oneway" in df else None
+        return cls.from_edges(nodes[:, 0] / 1e7, nodes[:, 1] / 1e7, inverse[:n], inverse[n:], speed, oneway)
+
+    @classmethod
+    def from_osm_xml(cls, path, speeds=HIGHWAY_SPEEDS_KMH):
+        """Car road network from an OSM XML extract (``.osm``, ``.osm.gz`` or ``.osm.bz2``).
+
+        PBF extracts can be converted first, e.g. ``osmium cat in.osm.pbf -o out.osm.bz2``.
+        """
+        node_pos = {}
+        tails, heads, way_speeds, oneways = [], [], [], []
+        with _open_text(path) as f:
+            for _, elem in ET.iterparse(f, events=("end",)):
+                if elem.tag == "node":
+                    node_pos[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+                    elem.clear()
+                elif elem.tag == "way":
+                    tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                    highway = tags.get("highway")
+                    if highway in speeds and tags.get("access") not in _NO_ACCESS \
+                            and tags.get("motor_vehicle") not in _NO_ACCESS:
+                        refs = [int(nd.get("ref")) for nd in elem.iter("nd")]
+                        direction = tags.get("oneway", "")
+                        if direction == "-1":
+                            refs.reverse()
+                        oneway = (direction in ("yes", "true", "1", "-1")
+                                  or (direction != "no" and (highway == "motorway"
+                                                             or tags.get("junction") == "roundabout")))
+                        speed = _parse_maxspeed(tags.get("maxspeed")) or speeds[highway]
+                        tails.extend(refs[:-1])
+                        heads.extend(refs[1:])
+                        way_speeds.extend([speed] * (len(refs) - 1))
+                        oneways.extend([oneway] * (len(refs) - 1))
+                    elem.clear()
+                elif elem.tag == "relation":
+                    elem.clear()
+
+        tails = np.array(tails, dtype=np.int64)
+        heads = np.array(heads, dtype=np.int64)
+        known = np.array([t in node_pos and h in node_pos for t, h in zip(tails.tolist(), heads.tolist())],
+                         dtype=bool)
+        tails, heads = tails[known], heads[known]
+        # Alleen knooppunten die in een weg voorkomen, hernummerd naar 0..n-1
+        osm_ids, inverse = np.unique(np.concatenate([tails, heads]), return_inverse=True)
+        coords = np.array([node_pos[i] for i in osm_ids.tolist()], dtype=np.float64).reshape(-1, 2)
+        n = len(tails)
+        return cls.from_edges(coords[:, 0], coords[:, 1], inverse[:n], inverse[n:],
+                              np.array(way_speeds, dtype=np.float64)[known], np.array(oneways, dtype=bool)[known])
+
+    def write(self, graph_dir):
+        """Write the arrays as ``.npy`` files plus ``meta.json`` to ``graph_dir``."""
+        os.makedirs(graph_dir, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(graph_dir, name + ".npy"), np.ascontiguousarray(getattr(self, name)))
+        meta = {"format": GRAPH_FORMAT, "nodes": len(self), "edges": self.n_edges,
+                "max_speed_kmh": self.max_speed_kmh, "version": self.version}
+        tmp = os.path.join(graph_dir, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(graph_dir, "meta.json"))
+
+    @classmethod
+    def open(cls, graph_dir):
+        """Memory-map a graph written by :meth:`write`."""
+        with open(os.path.join(graph_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != GRAPH_FORMAT:
+            raise ValueError("Onbekend graafformaat in {}".format(graph_dir))
+        arrays = {name: np.load(os.path.join(graph_dir, name + ".npy"), mmap_mode="r") for name in _ARRAYS}
+        # Grafen van voor het versieveld krijgen hun hash bij het openen
+        return cls(arrays, meta["max_speed_kmh"], meta.get("version"))
+
+    @classmethod
+    def load(cls, path):
+        """Open a graph directory, or build from a ``.osm[.gz|.bz2]`` or ``.csv`` file."""
+        if os.path.isdir(path):
+            return cls.open(path)
+        if path.endswith(".csv"):
+            return cls.from_edge_csv(path)
+        return cls.from_osm_xml(path)
+
+
+class LocalGraphRouter:
+    """Routing backend on a :class:`RoadGraph`, with the ``OSRMClient`` route/table interface."""
+
+    def __init__(self, graph, max_snap_km=MAX_SNAP_KM):
+        self.graph = graph
+        self.max_snap_km = max_snap_km
+        # Sleutel voor afgeleide caches (stoplijsten, voorberekening): per graaf, niet per klasse
+        self.identity = "local:{}".format(graph.version)
+        self.nodes = StationIndex(graph.lat, graph.lon, cell_deg=0.05)
+        self._xyz = to_xyz_km(graph.lat, graph.lon)
+        # Seconden per km in rechte lijn bij de hoogste snelheid in de graaf: een ondergrens voor A*
+        self._s_per_km = 3600.0 / graph.max_speed_kmh
+        self._adjacency = {
+            True: (graph.fwd_indptr, graph.fwd_head, graph.fwd_duration, graph.fwd_length),
+            False: (graph.bwd_indptr, graph.bwd_head, graph.bwd_duration, graph.bwd_length),
+        }
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        return cls(RoadGraph.load(path), **kwargs)
+
+    def snap(self, lat, lon):
+        """Nearest graph node to ``(lat, lon)``, or None when it is beyond ``max_snap_km``."""
+        idx, dist = self.nodes.query_nearest(lat, lon, k=1)
+        if not len(idx) or dist[0] > self.max_snap_km:
+            return None
+        return int(idx[0])
+
+    def nearest(self, point):
+        """``(lat, lon, distance_m)`` of the graph node ``(lat, lon)`` snaps to, or None."""
+        idx, dist = self.nodes.query_nearest(point[0], point[1], k=1)
+        if not len(idx) or dist[0] > self.max_snap_km:
+            return None
+        return float(self.graph.lat[idx[0]]), float(self.graph.lon[idx[0]]), float(dist[0]) * 1000
+
+    def shortest_path(self, source, target):
+        """Fastest node path ``source -> target`` with bidirectional A*, or None.
+
+        Both searches use the average potential ``(h_t(v) - h_s(v)) / 2``,
+        which keeps the reduced edge costs identical in both directions, so
+        the usual bidirectional Dijkstra stopping rule stays exact. ``h`` is
+        the straight-line (chord) distance at the graph's top speed.
+        """
+        if source == target:
+            return [source]
+        item = self._xyz.item
+        sx, sy, sz = item(source, 0), item(source, 1), item(source, 2)
+        tx, ty, tz = item(target, 0), item(target, 1), item(target, 2)
+        scale = self._s_per_km / 2
+        potential = {}
+
+        def pot(v):
+            p = potential.get(v)
+            if p is None:
+                x, y, z = item(v, 0), item(v, 1), item(v, 2)
+                p = potential[v] = scale * (math.sqrt((x - tx) ** 2 + (y - ty) ** 2 + (z - tz) ** 2)
+                                            - math.sqrt((x - sx) ** 2 + (y - sy) ** 2 + (z - sz) ** 2))
+            return p
+
+        dist = {True: {source: 0.0}, False: {target: 0.0}}
+        parent = {True: {source: -1}, False: {target: -1}}
+        settled = {True: set(), False: set()}
+        heaps = {True: [(0.0, source)], False: [(0.0, target)]}
+        best, meet = math.inf, None
+        while heaps[True] and heaps[False]:
+            if heaps[True][0][0] + heaps[False][0][0] >= best:
+                break
+            forward = heaps[True][0][0] <= heaps[False][0][0]
+            sign = 1.0 if forward else -1.0
+            d_u, u = heapq.heappop(heaps[forward])
+            if u in settled[forward]:
+                continue
+            settled[forward].add(u)
+            indptr, head, duration, _ = self._adjacency[forward]
+            own, other, parents = dist[forward], dist[not forward], parent[forward]
+            base = d_u - sign * pot(u)
+            a, b = int(indptr[u]), int(indptr[u + 1])
+            for v, w in zip(head[a:b].tolist(), duration[a:b].tolist()):
+                # Gereduceerde kosten; niet-negatief omdat de potentiaal consistent is
+                d_v = base + w + sign * pot(v)
+                if d_v < own.get(v, math.inf):
+                    own[v] = d_v
+                    parents[v] = u
+                    heapq.heappush(heaps[forward], (d_v, v))
+                    if v in other and d_v + other[v] < best:
+                        best, meet = d_v + other[v], v
+        if meet is None:
+            return None
+        path = []
+        v = meet
+        while v != -1:
+            path.append(v)
+            v = parent[True][v]
+        path.reverse()
+        v = parent[False][meet]
+        while v != -1:
+            path.append(v)
+            v = parent[False][v]
+        return path
+
+    @metrics.traced("local.route")
+    def route(self, waypoints):
+        """Route through ``(lat, lon)`` waypoints as an (n, 2) ``[lon, lat]`` array; empty on failure."""
+        return self.route_legs(waypoints)[0]
+
+    def route_legs(self, waypoints):
+        """Like :meth:`route`, plus the index in the geometry of every waypoint."""
+        empty = np.empty((0, 2), dtype=np.float64), np.zeros(0, dtype=np.int64)
+        if len(waypoints) < 2:
+            return empty
+        nodes = [self.snap(lat, lon) for lat, lon in waypoints]
+        if any(node is None for node in nodes):
+            return empty
+        path = [nodes[0]]
+        legs = [0]
+        for a, b in zip(nodes[:-1], nodes[1:]):
+            leg = self.shortest_path(a, b)
+            if leg is None:
+                return empty
+            path.extend(leg[1:])
+            legs.append(len(path) - 1)
+        if len(path) == 1:
+            # Alle punten op hetzelfde knooppunt: net als OSRM toch twee hoekpunten
+            path.append(path[0])
+            legs[-1] = 1
+        path = np.asarray(path, dtype=np.int64)
+        coords = np.column_stack([np.asarray(self.graph.lon)[path], np.asarray(self.graph.lat)[path]])
+        return coords, np.asarray(legs, dtype=np.int64)
+
+    def _one_to_many(self, source, targets, forward=True):
+        """Dijkstra from ``source`` until all ``targets`` are settled; ``{node: (seconds, metres)}``."""
+        indptr, head, duration, length = self._adjacency[forward]
+        remaining = set(targets)
+        dist = {source: 0.0}
+        metres = {source: 0.0}
+        found = {}
+        heap = [(0.0, source)]
+        while heap and remaining:
+            d_u, u = heapq.heappop(heap)
+            if d_u > dist[u]:
+                continue
+            if u in remaining:
+                remaining.discard(u)
+                found[u] = (d_u, metres[u])
+            a, b = int(indptr[u]), int(indptr[u + 1])
+            m_u = metres[u]
+            for v, w, m in zip(head[a:b].tolist(), duration[a:b].tolist(), length[a:b].tolist()):
+                d_v = d_u + w
+                if d_v < dist.get(v, math.inf):
+                    dist[v] = d_v
+                    metres[v] = m_u + m
+                    heapq.heappush(heap, (d_v, v))
+        return found
+
+    @metrics.traced("local.table")
+    def table(self, waypoints, sources=None, destinations=None):
+        """Duration (s) and distance (m) matrices like :meth:`OSRMClient.table`; NaN when unreachable.
+
+        Searches run from whichever side has fewer points (reverse searches
+        over the backward adjacency when there are fewer destinations).
+        """
+        sources = list(range(len(waypoints))) if sources is None else list(sources)
+        destinations = list(range(len(waypoints))) if destinations is None else list(destinations)
+        nodes = [self.snap(lat, lon) for lat, lon in waypoints]
+        durations = np.full((len(sources), len(destinations)), np.nan)
+        distances = np.full((len(sources), len(destinations)), np.nan)
+        forward = len(sources) <= len(destinations)
+        outer, inner = (sources, destinations) if forward else (destinations, sources)
+        inner_nodes = [nodes[i] for i in inner if nodes[i] is not None]
+        for a, i in enumerate(outer):
+            if nodes[i] is None:
+                continue
+            found = self._one_to_many(nodes[i], inner_nodes, forward=forward)
+            for b, j in enumerate(inner):
+                hit = found.get(nodes[j]) if nodes[j] is not None else None
+                if hit is not None:
+                    row, col = (a, b) if forward else (b, a)
+                    durations[row, col], distances[row, col] = hit
+        return durations, distances
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build a routing graph for the local router.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="convert an OSM extract or CSV edge list to a graph directory")
+    build.add_argument("source", help=".osm, .osm.gz, .osm.bz2 or .csv edge list")
+    build.add_argument("-o", "--output", required=True, help="graph directory")
+    args = parser.parse_args()
+    graph = RoadGraph.load(args.source)
+    graph.write(args.output)
+    print("{} knooppunten, {} wegdelen, graaf in {}".format(len(graph), graph.n_edges, args.output))
@@ -0,0 +1,116 @@
+"""Route map rendering with zoom-dependent simplification.
+
+The full-resolution OSRM geometry is only needed for distance calculations.
+For the map it is simplified with Douglas–Peucker in Web Mercator pixel space,
+so the tolerance is exactly "how many screen pixels may the line move" at the
+zoom level the map opens with.
+"""
+import math
+
+import folium
+import numpy as np
+
+import metrics
+from route_geometry import to_array
+
+TILE_SIZE = 256
+MAX_ZOOM = 18
+# Afwijking in schermpixels die bij het openingszoomniveau acceptabel is
+DEFAULT_TOLERANCE_PX = 0.5
+# Zoveel niveaus inzoomen moet de lijn er nog goed uitzien
+DETAIL_ZOOMS = 2
+
+
+def mercator_px(coords, zoom):
+    """Project ``[lon, lat]`` coordinates to Web Mercator pixels at ``zoom``."""
+    arr = to_array(coords)
+    scale = TILE_SIZE * 2.0 ** zoom
+    lat = np.radians(np.clip(arr[:, 1], -85.05112878, 85.05112878))
+    x = (arr[:, 0] + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * scale
+    return np.column_stack([x, y])
+
+
+def douglas_peucker(points, tolerance):
+    """Boolean mask of the points Douglas–Peucker keeps for planar ``points`` (n, 2)."""
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        a, b = points[i], points[j]
+        ab = b - a
+        ap = points[i + 1:j] - a
+        len2 = float(ab @ ab)
+        if len2 > 0:
+            t = np.clip(ap @ ab / len2, 0.0, 1.0)
+            diff = ap - t[:, None] * ab
+        else:
+            diff = ap
+        d2 = np.einsum("ij,ij->i", diff, diff)
+        k = int(np.argmax(d2))
+        if d2[k] > tolerance * tolerance:
+            mid = i + 1 + k
+            keep[mid] = True
+            stack.append((i, mid))
+            stack.append((mid, j))
+    return keep
+
+
+def simplify_for_zoom(coords, zoom, tolerance_px=DEFAULT_TOLERANCE_PX):
+    """Simplified ``[lon, lat]`` array that looks the same as ``coords`` at ``zoom``."""
+    arr = to_array(coords)
+    if len(arr) < 3:
+        return arr
+    return arr[douglas_peucker(mercator_px(arr, zoom), tolerance_px)]
+
+
+def fit_zoom(coords, width_px=800, height_px=500, padding_px=20):
+    """Largest integer zoom at which all coordinates fit in the given viewport."""
+    arr = to_array(coords)
+    if len(arr) < 2:
+        return MAX_ZOOM
+    for zoom in range(MAX_ZOOM, -1, -1):
+        px = mercator_px(arr, zoom)
+        span = px.max(axis=0) - px.min(axis=0)
+        if span[0] <= width_px - 2 * padding_px and span[1] <= height_px - 2 * padding_px:
+            return zoom
+    return 0
+
+
+@metrics.traced("render")
+def route_map(route_coords, stations=(), start=None, end=None, width_px=800, height_px=500,
+              detail_zooms=DETAIL_ZOOMS, deliveries=()):
+    """Folium map with the simplified route and station markers.
+
+    ``route_coords`` is OSRM ``[lon, lat]`` geometry, ``stations`` are
+    ``(name, lat, lon)`` tuples and ``start``/``end`` ``(lat, lon)``.
+    ``deliveries`` are ``(label, lat, lon)`` tuples for the stops of a trip.
+    Returns ``(map, info)`` where ``info`` has the zoom and point counts.
+    """
+    arr = to_array(route_coords)
+    zoom = fit_zoom(arr, width_px, height_px)
+    # Vereenvoudigen voor een paar niveaus dieper dan het openingsbeeld, zodat inzoomen niet hoekig wordt
+    simplified = simplify_for_zoom(arr, min(zoom + detail_zooms, MAX_ZOOM))
+
+    fmap = folium.Map(tiles="OpenStreetMap", control_scale=True)
+    if len(simplified):
+        folium.PolyLine(simplified[:, ::-1].tolist(), color="#1f6feb", weight=5, opacity=0.85).add_to(fmap)
+        fmap.fit_bounds([[float(arr[:, 1].min()), float(arr[:, 0].min())],
+                         [float(arr[:, 1].max()), float(arr[:, 0].max())]])
+    if start:
+        folium.Marker(start, tooltip="Start", icon=folium.Icon(color="green", icon="play")).add_to(fmap)
+    if end:
+        folium.Marker(end, tooltip="Eind", icon=folium.Icon(color="red", icon="flag")).add_to(fmap)
+    for i, (label, lat, lon) in enumerate(deliveries, 1):
+        folium.Marker((lat, lon), tooltip="Stop {}: {}".format(i, label),
+                      icon=folium.Icon(color="blue", icon="shopping-cart")).add_to(fmap)
+    for i, (name, lat, lon) in enumerate(stations, 1):
+        folium.Marker((lat, lon), tooltip="Tankmoment {}: {}".format(i, name),
+                      icon=folium.Icon(color="orange", icon="tint")).add_to(fmap)
+    return fmap, {"zoom": zoom, "points": len(arr), "rendered_points": len(simplified)}
@@ -0,0 +1,243 @@
+"""Lightweight stage timing and counters.
+
+Code marks stages with :func:`span` or :func:`traced` and counts events with
+:func:`count`. Everything is recorded twice: per request in the active
+:class:`Trace` (for the debug panel and a JSON log line) and process-wide in
+the registry (for the Prometheus text export).
+
+Metrics are off unless ``ROUTEPLANNER_METRICS`` is set or :func:`enable` is
+called. When off, :func:`span` returns a shared no-op object and
+:func:`count` returns immediately, so instrumented code pays one flag check.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("routeplanner.metrics")
+
+_enabled = os.environ.get("ROUTEPLANNER_METRICS", "").lower() not in ("", "0", "false", "no")
+_current = contextvars.ContextVar("routeplanner_trace", default=None)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(flag=True):
+    """Switch metrics recording on or off for the whole process."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+class _Stats:
+    """Thread-safe stage timings (calls, seconds) and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            calls, total = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (calls + 1, total + seconds)
+
+    def add(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stages), dict(self.counters)
+
+
+class Trace(_Stats):
+    """Stages and counters of a single request (one click or one batch lane)."""
+
+    def __init__(self, name, **fields):
+        super().__init__()
+        self.name = name
+        self.fields = fields
+        self.started = time.time()
+        self.seconds = None
+
+    def as_dict(self):
+        stages, counters = self.snapshot()
+        return {
+            "trace": self.name,
+            **self.fields,
+            "started": round(self.started, 3),
+            "seconds": round(self.seconds, 6) if self.seconds is not None else None,
+            "stages": {name: {"calls": c, "seconds": round(s, 6)} for name, (c, s) in sorted(stages.items())},
+            "counters": dict(sorted(counters.items())),
+        }
+
+
+registry = _Stats()
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.t0
+        registry.add_stage(self.name, seconds)
+        trace = _current.get()
+        if trace is not None:
+            trace.add_stage(self.name, seconds)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name):
+    """Context manager that records the wall time of a stage."""
+    return _Span(name) if _enabled else _NOOP
+
+
+def traced(name):
+    """Decorator form of :func:`span`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    """Add ``value`` to a counter (cache hits, payload bytes, ...)."""
+    if not _enabled:
+        return
+    registry.add(name, value)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, value)
+
+
+@contextmanager
+def trace(name, **fields):
+    """Collect all spans and counts below this block into a :class:`Trace`.
+
+    Yields the trace (None when metrics are off). On exit the trace is logged
+    as one JSON line on the ``routeplanner.metrics`` logger.
+    """
+    if not _enabled:
+        yield None
+        return
+    current = Trace(name, **fields)
+    token = _current.set(current)
+    t0 = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - t0
+        _current.reset(token)
+        registry.add_stage(name, current.seconds)
+        logger.info(json.dumps(current.as_dict(), ensure_ascii=False))
+
+
+def log_json(stream=None):
+    """Write trace lines as bare JSON to ``stream`` (stderr by default); safe to call again."""
+    if any(getattr(h, "_json_lines", False) for h in logger.handlers):
+        return
+    # Kale JSON-regels, zodat de uitvoer direct door een log-shipper of jq kan
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler._json_lines = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def in_current_trace(fn):
+    """Wrap ``fn`` so it records into the caller's trace when run on another thread."""
+    ctx = contextvars.copy_context()
+    return functools.wraps(fn)(lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs))
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def render_prometheus():
+    """Process-wide metrics in the Prometheus text exposition format."""
+    stages, counters = registry.snapshot()
+    lines = [
+        "# HELP routeplanner_stage_seconds_total Wall time spent per planning stage.",
+        "# TYPE routeplanner_stage_seconds_total counter",
+    ]
+    lines += ['routeplanner_stage_seconds_total{{stage="{}"}} {:.6f}'.format(_label(n), s)
+              for n, (_, s) in sorted(stages.items())]
+    lines += [
+        "# HELP routeplanner_stage_calls_total Number of times each planning stage ran.",
+        "# TYPE routeplanner_stage_calls_total counter",
+    ]
+    lines += ['routeplanner_stage_calls_total{{stage="{}"}} {}'.format(_label(n), c)
+              for n, (c, _) in sorted(stages.items())]
+    lines += [
+        "# HELP routeplanner_events_total Cache hits, misses, upstream payload bytes and other counters.",
+        "# TYPE routeplanner_events_total counter",
+    ]
+    lines += ['routeplanner_events_total{{name="{}"}} {}'.format(_label(n), v) for n, v in sorted(counters.items())]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Atomically write :func:`render_prometheus` output, e.g. for node_exporter's textfile collector."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+def serve_prometheus(port, host="127.0.0.1"):
+    """Serve ``/metrics`` on a background thread; returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
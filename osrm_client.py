@@ -0,0 +1,193 @@
+"""OSRM HTTP client with connection pooling, retries and a two-level cache.
+
+Responses are cached in a process-wide in-memory LRU and in a SQLite file, so
+repeated lanes never hit the network. Cache keys use rounded waypoints, which
+makes nearby geocoding results share an entry.
+"""
+import os
+import threading
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metrics
+import pipeline
+from cache import DiskCache, LRUCache
+from route_geometry import decode_polyline, waypoint_indices
+
+OSRM_SERVER = os.environ.get("OSRM_SERVER", "https://router.project-osrm.org")
+DEFAULT_CACHE_PATH = os.environ.get(
+    "OSRM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "osrm.sqlite"))
+
+
+class OSRMClient:
+    """Client for an OSRM server.
+
+    ``cache_path=None`` disables the disk cache; the in-memory LRU is always on.
+    ``rate_limiter`` (a :class:`ratelimit.TokenBucket`) caps network requests;
+    cache hits are never throttled.
+    """
+
+    def __init__(self, server=OSRM_SERVER, profile="driving", timeout=(5, 30), retries=3, backoff=0.5,
+                 cache_path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, max_entries=20000, memory_entries=256,
+                 precision=5, rate_limiter=None):
+        self.server = server.rstrip("/")
+        self.profile = profile
+        self.timeout = timeout
+        self.precision = precision
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"]), respect_retry_after_header=True)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "og-routeplanner/1.0"
+        self.memory = LRUCache(memory_entries)
+        self.disk = DiskCache(cache_path, ttl=ttl, max_entries=max_entries) if cache_path else None
+        self._stats_lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+        metrics.count("osrm." + name)
+
+    def _coord_str(self, waypoints):
+        """Waypoints as ``(lat, lon)`` pairs to the rounded ``lon,lat;...`` OSRM format."""
+        fmt = "{:.%df},{:.%df}" % (self.precision, self.precision)
+        return ";".join(fmt.format(lon, lat) for lat, lon in waypoints)
+
+    def _query(self, service, waypoints, params):
+        """``(coords, query, cache_key)`` for a request."""
+        coords = self._coord_str(waypoints)
+        query = "&".join("{}={}".format(k, params[k]) for k in sorted(params))
+        return coords, query, "{}|{}|{}|{}".format(service, self.profile, coords, query)
+
+    def request(self, service, waypoints, **params):
+        """GET ``/{service}/v1/{profile}/{coords}`` and return the JSON body, or None on failure.
+
+        Only responses with ``code == "Ok"`` are cached.
+        """
+        coords, query, key = self._query(service, waypoints, params)
+
+        data = self.memory.get(key)
+        if data is not None:
+            self._count("memory_hits")
+            return data
+        if self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                self._count("disk_hits")
+                self.memory.put(key, data)
+                return data
+
+        self._count("misses")
+        url = "{}/{}/v1/{}/{}".format(self.server, service, self.profile, coords)
+        try:
+            # Begrensd aantal gelijktijdige verzoeken (pipeline.limit), daarbinnen de rate limiter
+            with pipeline.limit("osrm"):
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                with metrics.span("osrm." + service):
+                    response = self.session.get(url, params=query or None, timeout=self.timeout)
+        except requests.RequestException:
+            self._count("errors")
+            return None
+        metrics.count("osrm.bytes", len(response.content))
+        if response.status_code != 200:
+            self._count("errors")
+            return None
+        try:
+            data = response.json()
+        except ValueError:
+            self._count("errors")
+            return None
+        if data.get("code") != "Ok":
+            self._count("errors")
+            return None
+        self.memory.put(key, data)
+        if self.disk is not None:
+            self.disk.put(key, data)
+        return data
+
+    def route(self, waypoints):
+        """Full route geometry through ``(lat, lon)`` waypoints as an (n, 2) ``[lon, lat]`` array.
+
+        The geometry is transferred as ``polyline6`` (several times smaller than
+        GeoJSON) and decoded with NumPy. Returns an empty array on failure.
+        """
+        if len(waypoints) < 2:
+            return np.empty((0, 2), dtype=np.float64)
+        data = self.request("route", waypoints, overview="full", geometries="polyline6")
+        if not data or not data.get("routes"):
+            return np.empty((0, 2), dtype=np.float64)
+        return decode_polyline(data["routes"][0]["geometry"])
+
+    def route_legs(self, waypoints):
+        """Like :meth:`route`, plus the index in the geometry of every waypoint.
+
+        Shares the cached response with :meth:`route`; returns two empty arrays on failure.
+        """
+        if len(waypoints) < 2:
+            return np.empty((0, 2), dtype=np.float64), np.zeros(0, dtype=np.int64)
+        data = self.request("route", waypoints, overview="full", geometries="polyline6")
+        if not data or not data.get("routes"):
+            return np.empty((0, 2), dtype=np.float64), np.zeros(0, dtype=np.int64)
+        coords = decode_polyline(data["routes"][0]["geometry"])
+        # OSRM legt de gesnapte waypoints altijd als hoekpunt in de geometrie
+        locations = [wp["location"] for wp in data.get("waypoints") or []]
+        if len(locations) != len(waypoints):
+            locations = [(lon, lat) for lat, lon in waypoints]
+        return coords, waypoint_indices(coords, locations)
+
+    def nearest(self, point):
+        """``(lat, lon, distance_m)`` of the road position OSRM snaps ``(lat, lon)`` to, or None."""
+        data = self.request("nearest", [point], number=1)
+        if not data or not data.get("waypoints"):
+            return None
+        waypoint = data["waypoints"][0]
+        lon, lat = waypoint["location"]
+        return lat, lon, float(waypoint.get("distance", np.nan))
+
+    def table(self, waypoints, sources=None, destinations=None):
+        """Duration (s) and distance (m) matrices between ``(lat, lon)`` waypoints.
+
+        ``sources``/``destinations`` are index lists into ``waypoints`` (all when
+        None). Returns ``(durations, distances)`` as float arrays with NaN for
+        unreachable pairs, or None on failure.
+        """
+        params = {"annotations": "duration,distance"}
+        if sources is not None:
+            params["sources"] = ";".join(str(i) for i in sources)
+        if destinations is not None:
+            params["destinations"] = ";".join(str(i) for i in destinations)
+        data = self.request("table", waypoints, **params)
+        if not data or "durations" not in data:
+            return None
+        durations = np.array(data["durations"], dtype=np.float64)
+        distances = np.array(data.get("distances") or np.full(durations.shape, np.nan), dtype=np.float64)
+        return durations, distances
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_default_client():
+    """Process-wide routing backend, created on first use from ``ROUTING_BACKEND``."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            from routing import make_backend
+            _default_client = make_backend()
+        return _default_client
+
+
+def set_default_client(client):
+    """Replace the process-wide backend, e.g. to change server, rate limit or use a local router."""
+    global _default_client
+    with _default_lock:
+        _default_client = client
@@ -0,0 +1,87 @@
+"""Concurrent fan-out of independent upstream calls.
+
+Calls that do not depend on each other (geocoding start and end, the OSRM
+table requests for different route stretches, two routes) run on one shared
+thread pool, so a request takes as long as its longest chain of calls rather
+than the sum of all calls. Each provider has a semaphore that caps its
+requests in flight across all threads; rate limits (token buckets) still
+apply on top of that.
+
+When one call raises, calls that have not started yet are cancelled and the
+exception is raised immediately, without waiting for calls already running.
+"""
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import metrics
+
+MAX_WORKERS = 16
+# Maximaal gelijktijdige verzoeken per provider; Nominatim staat er één toe
+PROVIDER_CONCURRENCY = {"osrm": 4, "nominatim": 1, "photon": 2}
+DEFAULT_CONCURRENCY = 4
+
+_limits = {}
+_limits_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+_worker = threading.local()
+
+
+class Cancelled(Exception):
+    """A call was skipped because another call in the same fan-out failed."""
+
+
+def set_concurrency(provider, max_in_flight):
+    """Change how many requests to ``provider`` may run at the same time."""
+    with _limits_lock:
+        PROVIDER_CONCURRENCY[provider] = max_in_flight
+        _limits[provider] = threading.BoundedSemaphore(max_in_flight)
+
+
+def limit(provider):
+    """Semaphore to hold (``with pipeline.limit("osrm"): ...``) around a request to ``provider``."""
+    with _limits_lock:
+        sem = _limits.get(provider)
+        if sem is None:
+            sem = _limits[provider] = threading.BoundedSemaphore(
+                PROVIDER_CONCURRENCY.get(provider, DEFAULT_CONCURRENCY))
+        return sem
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="pipeline",
+                                           initializer=lambda: setattr(_worker, "active", True))
+        return _executor
+
+
+def gather(*calls):
+    """Run zero-argument callables concurrently; returns their results in order.
+
+    Calls run in the caller's metrics trace. A ``gather`` from inside a pool
+    worker runs its calls inline, so nested fan-outs cannot exhaust the pool.
+    """
+    if len(calls) <= 1 or getattr(_worker, "active", False):
+        return [call() for call in calls]
+    failed = threading.Event()
+
+    def guarded(call):
+        def run():
+            if failed.is_set():
+                raise Cancelled()
+            return call()
+        return metrics.in_current_trace(run)
+
+    pool = _get_executor()
+    futures = [pool.submit(guarded(call)) for call in calls]
+    done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+    for future in futures:
+        if future in done and future.exception() is not None:
+            failed.set()
+            for other in pending:
+                other.cancel()
+            metrics.count("pipeline.cancelled", len(pending))
+            raise future.exception()
+    return [future.result() for future in futures]
@@ -0,0 +1,231 @@
+"""Route planning core: OSRM routing, corridor filtering and refuel-stop selection.
+
+Importable without Streamlit, so the web app and the batch CLI share it.
+"""
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from corridor import stations_along_route
+from detour import score_along_route
+from geocoding import geocode_many
+from lane_cache import get_lane_cache
+from osrm_client import get_default_client
+from refuel_planner import plan_refuel_stops
+from route_geometry import cumulative_distance, route_length
+from routing import backend_id
+from station_index import StationIndex
+from station_store import get_station_store
+from trip_planner import DEFAULT_TIME_BUDGET_S, solve_order
+
+# Lengte van de routestukken die elk één set ankerpunten voor de omrijscore delen;
+# vast (niet afhankelijk van het tankinterval) zodat scores herbruikbaar zijn
+DETOUR_BIN_KM = 50.0
+# Aangenomen snelheid voor omrijden als OSRM een station niet kon scoren
+FALLBACK_DETOUR_SPEED_KMH = 50
+
+_station_index = None
+_station_index_lock = threading.Lock()
+
+
+def get_station_index():
+    """Index over the station store, built once per process."""
+    global _station_index
+    with _station_index_lock:
+        if _station_index is None:
+            store = get_station_store()
+            _station_index = StationIndex(store.lat, store.lon)
+        return _station_index
+
+
+@metrics.traced("osrm_route")
+def get_osrm_route(waypoints):
+    return get_default_client().route(waypoints)
+
+
+class LanePlan:
+    """Planning state for one start/end pair, reusable across parameter changes.
+
+    The base route, its cumulative distances, the corridor candidates and
+    their detour scores are computed once. Candidates are kept for the widest
+    corridor seen so far (a narrower corridor is a filter on them) and detours
+    are only scored for stations not scored before, so changing ``interval_km``
+    or ``corridor_km`` only reruns stop selection and the final route.
+
+    ``via`` are intermediate ``(lat, lon)`` stops (deliveries) visited in the
+    given order. Refuel stops are planned over the whole trip, so the tank
+    range carries over from one leg to the next.
+    """
+
+    def __init__(self, start, end, stations, index=None, client=None, via=()):
+        self.start = start
+        self.end = end
+        self.via = list(via)
+        self.stations = stations
+        self.index = index if index is not None else StationIndex(stations.lat, stations.lon)
+        self.client = client if client is not None else get_default_client()
+        with metrics.span("base_route"):
+            if self.via:
+                self.route, legs = self.client.route_legs([start] + self.via + [end])
+            else:
+                self.route, legs = self.client.route([start, end]), None
+        # Eén gevectoriseerde afstandsberekening voor de hele route
+        self.cum = cumulative_distance(self.route) if len(self.route) else np.zeros(0)
+        # Afstand langs de route tot elk tussenadres
+        self.via_km = self.cum[legs[1:-1]] if legs is not None and len(self.route) else np.zeros(0)
+        self._corridor_km = -1.0
+        self._hits = None
+        self._detour_s = {}
+        self._detour_km = {}
+
+    @property
+    def ok(self):
+        return len(self.route) > 0
+
+    def candidates(self, corridor_km):
+        """Corridor hits within ``corridor_km``, ordered along the route."""
+        with metrics.span("corridor"):
+            if corridor_km > self._corridor_km:
+                self._hits = stations_along_route(self.route, self.index, corridor_km, cum=self.cum)
+                self._corridor_km = corridor_km
+            keep = self._hits.distance_km <= corridor_km
+            hits = type(self._hits)(*(column[keep] for column in self._hits))
+        metrics.count("corridor.candidates", len(hits.indices))
+        return hits
+
+    @metrics.traced("detours")
+    def detours(self, hits):
+        """``(duration_s, distance_km)`` per hit; OSRM scores are fetched once per station."""
+        new = [k for k, i in enumerate(hits.indices.tolist()) if i not in self._detour_s]
+        metrics.count("detours.cached", len(hits.indices) - len(new))
+        if new:
+            metrics.count("detours.scored", len(new))
+            new = np.array(new)
+            duration, distance = score_along_route(self.client, self.route, self.cum, hits.offset_km[new],
+                                                   self.stations.coords(hits.indices[new]), bin_km=DETOUR_BIN_KM)
+            for i, d_s, d_km in zip(hits.indices[new].tolist(), duration.tolist(), distance.tolist()):
+                self._detour_s[i], self._detour_km[i] = d_s, d_km
+        detour_s = np.array([self._detour_s[i] for i in hits.indices.tolist()], dtype=np.float64)
+        detour_km = np.array([self._detour_km[i] for i in hits.indices.tolist()], dtype=np.float64)
+        # Zonder OSRM-score: schatting op basis van de afstand tot de route (heen en terug)
+        unscored = np.isnan(detour_s)
+        detour_km = np.where(np.isnan(detour_km), 2 * hits.distance_km, detour_km)
+        detour_s = np.where(unscored, detour_km / FALLBACK_DETOUR_SPEED_KMH * 3600, detour_s)
+        return detour_s, detour_km
+
+    def plan(self, interval_km=250, corridor_km=100):
+        """``(waypoints, used_stations, plan)`` for the given parameters; see
+        :func:`build_route_with_filtered_tankstations`."""
+        if not self.ok:
+            return [], [], None
+        hits = self.candidates(corridor_km)
+        detour_s, detour_km = self.detours(hits)
+        with metrics.span("refuel_plan"):
+            plan = plan_refuel_stops(hits.offset_km, self.cum[-1], interval_km, cost=np.maximum(detour_s, 0),
+                                     access_km=np.maximum(detour_km, 0) / 2)
+        used_stations = [self.stations.station(hits.indices[k]) for k in plan.stops]
+        # Tankstops en tussenadressen samen op volgorde van afstand langs de route
+        points = [(float(km), (lat, lon)) for km, (_, lat, lon) in zip(hits.offset_km[plan.stops], used_stations)]
+        points += [(float(km), wp) for km, wp in zip(self.via_km, self.via)]
+        points.sort(key=lambda item: item[0])
+        waypoints = [self.start] + [wp for _, wp in points] + [self.end]
+        return waypoints, used_stations, plan
+
+
+@metrics.traced("build_route")
+def build_route_with_filtered_tankstations(start, end, stations, interval_km=250, corridor_km=100, index=None):
+    """Plan refuel stops between start and end.
+
+    ``stations`` is a :class:`StationStore`; ``index`` a :class:`StationIndex`
+    over the same rows. Returns ``(waypoints, used_stations, plan)``; ``plan`` is the
+    :class:`RefuelPlan` (None when OSRM returned no route). When no plan fits
+    ``interval_km`` the stop list is empty and ``plan.gap_km`` tells where.
+    """
+    return LanePlan(start, end, stations, index=index).plan(interval_km, corridor_km)
+
+
+def build_trip(points, stations, end="free", index=None, client=None, time_budget_s=DEFAULT_TIME_BUDGET_S):
+    """Order a multi-stop trip with one duration matrix and plan it as one :class:`LanePlan`.
+
+    ``points`` are ``(lat, lon)`` tuples; the first is the start. ``end`` is
+    ``"start"`` (round trip), ``"last"`` (finish at the last point) or
+    ``"free"``. Returns ``(order, lane)`` where ``order`` lists indices into
+    ``points`` in visiting order, or ``(None, None)`` when the matrix failed.
+    """
+    client = client if client is not None else get_default_client()
+    if len(points) < 2:
+        return None, None
+    with metrics.span("trip_table"):
+        table = client.table(points)
+    if table is None:
+        return None, None
+    with metrics.span("trip_order"):
+        order, _ = solve_order(table[0], end=end, time_budget_s=time_budget_s)
+    lane = LanePlan(points[order[0]], points[order[-1]], stations, index=index, client=client,
+                    via=[points[k] for k in order[1:-1]])
+    return order, lane
+
+
+def plan_lane(origin, destination, interval_km=250, corridor_km=100):
+    """Geocode and plan one lane; returns a JSON-serialisable result dict.
+
+    Failures are reported in the ``error`` field rather than raised, so batch
+    runs keep going. Lanes planned before (same origin and destination cells,
+    parameters, station data and routing backend) come from the lane cache,
+    with ``cached`` set. With metrics enabled the lane's stage timings and
+    counters are added under ``metrics``.
+    """
+    with metrics.trace("lane", origin=origin, destination=destination) as trace:
+        result = _plan_lane(origin, destination, interval_km, corridor_km)
+    if trace is not None:
+        result["metrics"] = trace.as_dict()
+    return result
+
+
+def _plan_lane(origin, destination, interval_km, corridor_km):
+    t0 = time.perf_counter()
+    result = {
+        "origin": origin,
+        "destination": destination,
+        "interval_km": interval_km,
+        "corridor_km": corridor_km,
+        "status": "error",
+        "error": None,
+    }
+    try:
+        start, end = geocode_many([origin, destination])
+        if not start or not end:
+            result["error"] = "Kon één van de adressen niet vinden."
+            return result
+        store, client = get_station_store(), get_default_client()
+        lanes = get_lane_cache()
+        params = {"interval_km": interval_km, "corridor_km": corridor_km,
+                  "backend": backend_id(client)}
+        cached = lanes.get(start, end, store.cache_version, **params)
+        if cached is not None:
+            metrics.count("lane_cache.hits")
+            result.update(cached, start=list(start), end=list(end), cached=True)
+            return result
+        waypoints, used_stations, plan = build_route_with_filtered_tankstations(
+            start, end, store, interval_km=interval_km, corridor_km=corridor_km, index=get_station_index())
+        if plan is None:
+            result["error"] = "Kon geen route genereren met OSRM."
+            return result
+        route_coords = get_osrm_route(waypoints)
+        planned = {
+            "status": "ok" if plan.feasible else "infeasible",
+            "stops": [{"name": name, "lat": lat, "lon": lon} for name, lat, lon in used_stations],
+            "gap_km": list(plan.gap_km) if plan.gap_km else None,
+            "distance_km": round(route_length(route_coords, method="ellipsoidal"), 3) if len(route_coords) else None,
+        }
+        if len(route_coords):
+            lanes.put(start, end, store.cache_version, planned, **params)
+        result.update(planned, start=list(start), end=list(end), cached=False)
+        return result
+    except Exception as e:  # noqa: BLE001 - één mislukte lane mag de batch niet stoppen
+        result["error"] = repr(e)
+        return result
+    finally:
+        result["seconds"] = round(time.perf_counter() - t0, 4)
@@ -0,0 +1,35 @@
+"""Thread-safe token bucket for capping request rates to upstream services."""
+import threading
+import time
+
+
+class TokenBucket:
+    """Allow ``rate`` requests per second on average, with bursts up to ``burst``.
+
+    ``acquire`` blocks until a token is available; one bucket can be shared by
+    any number of threads.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate moet groter dan 0 zijn")
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping as long as needed; returns the time waited in seconds."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,135 @@
+"""Optimal refuel-stop selection along a route.
+
+Candidate stations are nodes at their along-route offset. A plan is a chain
+start -> stops -> end in which every leg fits within the vehicle's range; the
+planner finds the chain with the fewest stops (ties broken by total detour)
+or the smallest total detour.
+
+Legs are checked as ``offset_i - offset_j + access_j + access_i <= range``,
+where ``access`` is the one-way distance between the route and the station.
+Nodes are processed in offset order and the best predecessor is found with a
+min segment tree over ``offset - access``, so planning is O(n log n).
+"""
+import math
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class RefuelPlan(NamedTuple):
+    """Result of :func:`plan_refuel_stops`."""
+
+    feasible: bool
+    stops: np.ndarray  # posities in de kandidaatarrays, in volgorde langs de route
+    total_cost: float  # som van de omrijkosten van de gekozen stops
+    gap_km: Optional[Tuple[float, float]]  # eerste traject dat niet te overbruggen is
+
+
+class _MinTree:
+    """Min segment tree with point updates and suffix queries."""
+
+    def __init__(self, n):
+        self.size = 1
+        while self.size < max(n, 1):
+            self.size *= 2
+        self.value = [math.inf] * (2 * self.size)
+        self.node = [-1] * (2 * self.size)
+
+    def update(self, pos, value, node):
+        i = pos + self.size
+        self.value[i] = value
+        self.node[i] = node
+        i //= 2
+        while i:
+            left, right = 2 * i, 2 * i + 1
+            best = left if self.value[left] <= self.value[right] else right
+            self.value[i] = self.value[best]
+            self.node[i] = self.node[best]
+            i //= 2
+
+    def suffix_min(self, pos):
+        """Minimum (value, node) over positions >= pos."""
+        best_value, best_node = math.inf, -1
+        lo, hi = pos + self.size, 2 * self.size
+        while lo < hi:
+            if lo & 1:
+                if self.value[lo] < best_value:
+                    best_value, best_node = self.value[lo], self.node[lo]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                if self.value[hi] < best_value:
+                    best_value, best_node = self.value[hi], self.node[hi]
+            lo //= 2
+            hi //= 2
+        return best_value, best_node
+
+
+def plan_refuel_stops(offsets_km, route_length_km, max_range_km, cost=None, access_km=None, minimize="stops"):
+    """Choose refuel stops so that no leg exceeds ``max_range_km``.
+
+    ``offsets_km`` are the candidates' along-route positions, ``cost`` their
+    detour cost (any unit, default 0) and ``access_km`` their one-way distance
+    from the route (default 0). ``minimize`` is ``"stops"`` or ``"detour"``.
+
+    Returns a :class:`RefuelPlan`; when no chain of stops can cover the route,
+    ``feasible`` is False and ``gap_km`` gives the first stretch that cannot be
+    bridged.
+    """
+    if minimize not in ("stops", "detour"):
+        raise ValueError("minimize moet 'stops' of 'detour' zijn")
+    offsets = np.asarray(offsets_km, dtype=np.float64)
+    n = len(offsets)
+    cost = np.zeros(n) if cost is None else np.asarray(cost, dtype=np.float64)
+    access = np.zeros(n) if access_km is None else np.asarray(access_km, dtype=np.float64)
+    if minimize == "stops":
+        # Eén extra stop weegt altijd zwaarder dan alle omrijkosten samen
+        node_cost = cost + (float(np.sum(cost)) + 1.0)
+    else:
+        node_cost = cost
+
+    # Knopen: start, kandidaten (op volgorde langs de route), eind
+    order = np.argsort(offsets, kind="stable")
+    node_offset = np.concatenate([[0.0], offsets[order], [route_length_km]])
+    node_access = np.concatenate([[0.0], access[order], [0.0]])
+    node_weight = np.concatenate([[0.0], node_cost[order], [0.0]])
+    total = n + 2
+
+    # Vertrekpunt van een knoop is offset - access; gesorteerd voor suffix-queries
+    keys = node_offset - node_access
+    key_order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[key_order]
+    key_pos = np.empty(total, dtype=np.int64)
+    key_pos[key_order] = np.arange(total)
+
+    tree = _MinTree(total)
+    best = np.full(total, math.inf)
+    parent = np.full(total, -1, dtype=np.int64)
+    best[0] = 0.0
+    tree.update(int(key_pos[0]), 0.0, 0)
+    for i in range(1, total):
+        threshold = node_offset[i] + node_access[i] - max_range_km
+        value, prev = tree.suffix_min(int(np.searchsorted(sorted_keys, threshold, side="left")))
+        if prev < 0:
+            continue
+        best[i] = value + node_weight[i]
+        parent[i] = prev
+        if i < total - 1:
+            tree.update(int(key_pos[i]), best[i], i)
+
+    if not math.isfinite(best[-1]):
+        reachable = np.nonzero(np.isfinite(best[:-1]))[0]
+        # Verste punt langs de route dat vanaf een bereikbare knoop te halen is
+        furthest = float(np.max(keys[reachable]) + max_range_km)
+        later = node_offset[1:][node_offset[1:] > furthest]
+        gap_end = float(later.min()) if len(later) else float(route_length_km)
+        return RefuelPlan(False, np.zeros(0, dtype=np.int64), math.inf,
+                          (min(furthest, float(route_length_km)), gap_end))
+
+    chain = []
+    i = parent[-1]
+    while i > 0:
+        chain.append(int(order[i - 1]))
+        i = parent[i]
+    stops = np.array(chain[::-1], dtype=np.int64)
+    return RefuelPlan(True, stops, float(cost[stops].sum()) if len(stops) else 0.0, None)
@@ -0,0 +1,35 @@
+"""Routing backend selection.
+
+A routing backend is any object with the ``route(waypoints)``,
+``route_legs(waypoints)`` and ``table(waypoints, sources, destinations)``
+methods of :class:`osrm_client.OSRMClient`. ``ROUTING_BACKEND`` picks the process-wide
+default: an OSRM base URL (the public demo server or a self-hosted
+``osrm-routed``) or ``local:<path>`` for the in-process
+:class:`local_router.LocalGraphRouter` on a graph directory, OSM extract or
+edge list.
+"""
+import os
+
+from osrm_client import OSRM_SERVER, OSRMClient
+
+ROUTING_BACKEND = os.environ.get("ROUTING_BACKEND", OSRM_SERVER)
+
+
+def make_backend(spec=ROUTING_BACKEND, **kwargs):
+    """Backend for ``spec``; ``kwargs`` go to :class:`OSRMClient` or :class:`LocalGraphRouter`."""
+    if spec.startswith("local:"):
+        from local_router import LocalGraphRouter
+        return LocalGraphRouter.from_path(spec[len("local:"):], **kwargs)
+    if spec.startswith(("http://", "https://")):
+        return OSRMClient(spec, **kwargs)
+    raise ValueError("Onbekende routing-backend: {!r} (verwacht een OSRM-URL of local:<pad>)".format(spec))
+
+
+def backend_id(client):
+    """Stable identity of a routing backend, for cache keys and metadata.
+
+    The OSRM base URL for :class:`OSRMClient`, ``local:<graph version>`` for
+    :class:`local_router.LocalGraphRouter`.
+    """
+    identity = getattr(client, "identity", None)
+    return identity if identity is not None else getattr(client, "server", type(client).__name__)
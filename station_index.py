@@ -0,0 +1,133 @@
+"""Spatial index for tank stations.
+
+Stations are bucketed in a regular lat/lon grid once. Radius queries only
+look at the grid cells that overlap the search circle, and nearest-neighbour
+queries grow the search radius until enough stations are found, so both stay
+sub-linear in the number of stations.
+"""
+import math
+
+import numpy as np
+
+from route_geometry import EARTH_RADIUS_KM, haversine_km
+
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+class StationIndex:
+    """Grid index over station coordinates (degrees).
+
+    Query results are indices into the arrays the index was built from, so
+    callers can keep their own station records and look them up afterwards.
+    """
+
+    def __init__(self, lats, lons, cell_deg=0.5):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if lats.shape != lons.shape:
+            raise ValueError("lats en lons moeten even lang zijn")
+        self.cell_deg = float(cell_deg)
+        self.n_rows = int(math.ceil(180 / self.cell_deg)) + 1
+        self.n_cols = int(math.ceil(360 / self.cell_deg))
+        self.lats = lats
+        self.lons = lons
+
+        keys = self._cell_keys(lats, lons)
+        self._order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[self._order]
+        self._sorted_lats = lats[self._order]
+        self._sorted_lons = lons[self._order]
+        unique, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+        self._cells = {int(k): (int(s), int(s + c)) for k, s, c in zip(unique, starts, counts)}
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _rows(self, lats):
+        return np.clip(np.floor((np.asarray(lats) + 90) / self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+
+    def _cols(self, lons):
+        return np.floor((np.asarray(lons) + 180) / self.cell_deg).astype(np.int64) % self.n_cols
+
+    def _cell_keys(self, lats, lons):
+        return self._rows(lats) * self.n_cols + self._cols(lons)
+
+    def _cell_keys_near(self, lat, lon, radius_km):
+        """Keys of all occupied grid cells overlapping the circle."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        row_lo, row_hi = int(self._rows(lat_lo)), int(self._rows(lat_hi))
+        max_abs_lat = max(abs(lat_lo), abs(lat_hi))
+        cos_lat = math.cos(math.radians(max_abs_lat))
+        if max_abs_lat >= 89.9 or radius_km / (KM_PER_DEG_LAT * cos_lat) >= 180:
+            cols = range(self.n_cols)
+        else:
+            dlon = radius_km / (KM_PER_DEG_LAT * cos_lat)
+            col_lo = int(self._cols(lon - dlon))
+            n = int(self._cols(lon + dlon)) - col_lo
+            cols = [(col_lo + i) % self.n_cols for i in range(n % self.n_cols + 1)]
+        cells = self._cells
+        return [key for row in range(row_lo, row_hi + 1)
+                for key in (row * self.n_cols + col for col in cols) if key in cells]
+
+    def _positions(self, keys):
+        """Positions (in grid order) of all stations in the given cells."""
+        chunks = [np.arange(*self._cells[key]) for key in keys]
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def _candidates(self, lat, lon, radius_km):
+        """Positions (in grid order) of all stations in cells overlapping the circle."""
+        return self._positions(self._cell_keys_near(lat, lon, radius_km))
+
+    def query_radius(self, lat, lon, radius_km, mask=None):
+        """Stations within ``radius_km`` of a point, nearest first.
+
+        Returns ``(indices, distances_km)``. ``mask`` is an optional boolean
+        array over all stations; stations where it is False are skipped.
+        """
+        if radius_km >= HALF_CIRCUMFERENCE_KM:
+            pos = np.arange(len(self.lats))
+        else:
+            pos = self._candidates(lat, lon, radius_km)
+        idx = self._order[pos]
+        if mask is not None:
+            keep = np.asarray(mask)[idx]
+            pos, idx = pos[keep], idx[keep]
+        dist = haversine_km(lat, lon, self._sorted_lats[pos], self._sorted_lons[pos])
+        inside = dist <= radius_km
+        idx, dist = idx[inside], dist[inside]
+        order = np.argsort(dist, kind="stable")
+        return idx[order], dist[order]
+
+    def query_nearest(self, lat, lon, k=1, mask=None):
+        """The ``k`` nearest stations to a point, nearest first.
+
+        Returns ``(indices, distances_km)``; fewer than ``k`` results only when
+        fewer stations (after ``mask``) exist.
+        """
+        available = len(self.lats) if mask is None else int(np.count_nonzero(mask))
+        k = min(k, available)
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        radius = self.cell_deg * KM_PER_DEG_LAT
+        while True:
+            idx, dist = self.query_radius(lat, lon, radius, mask=mask)
+            # Alles binnen de straal is gevonden, dus de k dichtstbijzijnde zijn exact
+            if len(idx) >= k or radius >= HALF_CIRCUMFERENCE_KM:
+                return idx[:k], dist[:k]
+            radius *= 2
+
+    def candidates_near(self, lats, lons, radii_km):
+        """Stations in grid cells overlapping any of the given circles.
+
+        A cheap superset for callers that run their own exact distance test;
+        returns sorted unique station indices.
+        """
+        radii = np.broadcast_to(np.asarray(radii_km, dtype=np.float64), np.shape(lats))
+        keys = set()
+        for lat, lon, r in zip(lats, lons, radii):
+            keys.update(self._cell_keys_near(float(lat), float(lon), float(r)))
+        return np.sort(self._order[self._positions(sorted(keys))])
@@ -0,0 +1,204 @@
+"""Offline precompute of road positions and metadata for the station dataset.
+
+Station coordinates in the source file are often tens of metres off the
+road, so every plan made OSRM snap them again. This job does that once per
+dataset version and stores, per station:
+
+* the road position from the routing backend's ``nearest`` (OSRM ``/nearest``),
+* the access bearing: compass bearing from that road position to the station,
+* the nearest motorway junction (OSM ``highway=motorway_junction``), from one
+  Overpass query or a saved Overpass JSON file,
+* a reverse-geocoded name for stations without one.
+
+The result is written next to the station snapshot and attached by
+:func:`station_store.load_stations` while it matches the dataset version.
+Usage::
+
+    python station_precompute.py
+    python station_precompute.py --junctions overpass
+    python station_precompute.py --junctions junctions.json --no-names
+"""
+import functools
+import json
+import logging
+import math
+import os
+import time
+
+import numpy as np
+import requests
+
+import pipeline
+from geocoding import reverse_geocode
+from route_geometry import bearing_deg
+from routing import backend_id
+from station_index import StationIndex
+from station_store import PRECOMPUTED_DTYPE, PrecomputedStations
+
+logger = logging.getLogger(__name__)
+
+OVERPASS_URL = os.environ.get("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+# Rastercellen (graden) voor de Overpass-query: alleen cellen met stations worden opgevraagd
+JUNCTION_CELL_DEG = 1.0
+# Verder weg dan dit telt een knooppunt niet meer als "dichtstbijzijnde afrit"
+JUNCTION_MAX_KM = 25.0
+# Dichter bij de weg dan dit heeft de toegangsrichting geen betekenis
+MIN_BEARING_M = 1.0
+
+
+def snap_stations(lats, lons, client):
+    """``(snap_lat, snap_lon, snap_m)`` arrays from ``client.nearest``; NaN where snapping failed."""
+    results = pipeline.gather(*(functools.partial(client.nearest, (lat, lon))
+                                for lat, lon in zip(lats.tolist(), lons.tolist())))
+    snapped = np.array([r if r is not None else (np.nan, np.nan, np.nan) for r in results],
+                       dtype=np.float64).reshape(-1, 3)
+    return snapped[:, 0], snapped[:, 1], snapped[:, 2]
+
+
+def _overpass_query(lats, lons, cell_deg=JUNCTION_CELL_DEG):
+    cells = sorted(set(zip(np.floor(lats / cell_deg).astype(int).tolist(),
+                           np.floor(lons / cell_deg).astype(int).tolist())))
+    # Buurcellen erbij, zodat een station vlak bij een celrand ook de afrit aan de overkant vindt
+    cells = sorted({(r + dr, c + dc) for r, c in cells for dr in (-1, 0, 1) for dc in (-1, 0, 1)})
+    boxes = "".join('node["highway"="motorway_junction"]({},{},{},{});'.format(
+        r * cell_deg, c * cell_deg, (r + 1) * cell_deg, (c + 1) * cell_deg) for r, c in cells)
+    return "[out:json][timeout:300];({});out;".format(boxes)
+
+
+def fetch_junctions(lats, lons, url=OVERPASS_URL, timeout=360):
+    """Motorway junctions around the stations as an Overpass JSON answer (one request)."""
+    response = requests.post(url, data={"data": _overpass_query(lats, lons)}, timeout=timeout,
+                             headers={"User-Agent": "og-routeplanner/1.0"})
+    response.raise_for_status()
+    return response.json()
+
+
+def parse_junctions(data):
+    """``(lats, lons, labels)`` from an Overpass JSON answer; labels like "Knooppunt Oudenrijn (13)"."""
+    lats, lons, labels = [], [], []
+    for element in data.get("elements", []):
+        if element.get("type") != "node":
+            continue
+        tags = element.get("tags", {})
+        name, ref = tags.get("name", ""), tags.get("ref", "")
+        if name and ref:
+            label = "{} ({})".format(name, ref)
+        else:
+            label = name or ("Afrit {}".format(ref) if ref else "Afrit")
+        lats.append(element["lat"])
+        lons.append(element["lon"])
+        labels.append(label)
+    return np.array(lats, dtype=np.float64), np.array(lons, dtype=np.float64), labels
+
+
+def nearest_junctions(lats, lons, junction_lats, junction_lons, max_km=JUNCTION_MAX_KM):
+    """``(junction_index, distance_km)`` per station; -1 and NaN beyond ``max_km``."""
+    index_out = np.full(len(lats), -1, dtype=np.int32)
+    dist_out = np.full(len(lats), np.nan, dtype=np.float32)
+    if not len(junction_lats):
+        return index_out, dist_out
+    index = StationIndex(junction_lats, junction_lons, cell_deg=0.1)
+    for i, (lat, lon) in enumerate(zip(lats.tolist(), lons.tolist())):
+        if math.isnan(lat):
+            continue
+        idx, dist = index.query_nearest(lat, lon, k=1)
+        if len(idx) and dist[0] <= max_km:
+            index_out[i], dist_out[i] = idx[0], dist[0]
+    return index_out, dist_out
+
+
+def fill_names(store):
+    """``{row: name}`` for stations without a name, by reverse geocoding their source position."""
+    missing = np.nonzero(store.names[store.records["name_id"]] == "")[0]
+    labels = pipeline.gather(*(functools.partial(reverse_geocode, float(store.lat[i]), float(store.lon[i]))
+                               for i in missing.tolist()))
+    return {i: label for i, label in zip(missing.tolist(), labels) if label}
+
+
+def precompute(store, client, junctions=None, names=True):
+    """:class:`PrecomputedStations` for ``store``.
+
+    ``junctions`` is an Overpass JSON answer (see :func:`fetch_junctions`) or
+    None to skip them; ``names`` turns reverse geocoding of unnamed stations on.
+    """
+    t0 = time.perf_counter()
+    lats = np.asarray(store.lat, dtype=np.float64)
+    lons = np.asarray(store.lon, dtype=np.float64)
+    records = np.empty(len(store), dtype=PRECOMPUTED_DTYPE)
+    records["snap_lat"], records["snap_lon"], records["snap_m"] = snap_stations(lats, lons, client)
+    with np.errstate(invalid="ignore"):
+        on_road = ~(records["snap_m"] >= MIN_BEARING_M)
+    records["bearing"] = np.where(on_road, np.nan, bearing_deg(records["snap_lat"], records["snap_lon"], lats, lons))
+
+    junction_labels = []
+    records["junction_id"], records["junction_km"] = -1, np.nan
+    if junctions is not None:
+        j_lats, j_lons, labels = parse_junctions(junctions)
+        # Afstand tot de afrit vanaf de weg als die bekend is, anders vanaf het station
+        from_lat = np.where(np.isnan(records["snap_lat"]), lats, records["snap_lat"])
+        from_lon = np.where(np.isnan(records["snap_lon"]), lons, records["snap_lon"])
+        nearest, dist = nearest_junctions(from_lat, from_lon, j_lats, j_lons)
+        # Alleen gebruikte labels bewaren, één keer per label
+        used = sorted({labels[j] for j in nearest.tolist() if j >= 0})
+        label_id = {label: k for k, label in enumerate(used)}
+        records["junction_id"] = [label_id[labels[j]] if j >= 0 else -1 for j in nearest.tolist()]
+        records["junction_km"] = dist
+        junction_labels = used
+
+    filled = fill_names(store) if names else {}
+    name_list = sorted(set(filled.values()))
+    name_id = {name: k for k, name in enumerate(name_list)}
+    records["name_id"] = -1
+    for row, name in filled.items():
+        records["name_id"][row] = name_id[name]
+
+    meta = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": backend_id(client),
+        "snapped": int(np.count_nonzero(~np.isnan(records["snap_m"]))),
+        "with_junction": int(np.count_nonzero(records["junction_id"] >= 0)),
+        "named": len(filled),
+        "seconds": round(time.perf_counter() - t0, 1),
+    }
+    return PrecomputedStations(records, np.array(name_list, dtype="U"), np.array(junction_labels, dtype="U"),
+                               store.version, meta)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from local_router import LocalGraphRouter
+    from osrm_client import OSRM_SERVER, OSRMClient
+    from station_store import DEFAULT_PRECOMPUTE_DIR, DEFAULT_SOURCE, load_stations
+
+    parser = argparse.ArgumentParser(description="Snap stations to the road and add junctions and names.")
+    parser.add_argument("source", nargs="?", default=DEFAULT_SOURCE, help=".csv or .parquet station file")
+    parser.add_argument("-o", "--out", default=DEFAULT_PRECOMPUTE_DIR)
+    parser.add_argument("--osrm-server", default=OSRM_SERVER)
+    parser.add_argument("--osrm-concurrency", type=int, default=pipeline.PROVIDER_CONCURRENCY["osrm"])
+    parser.add_argument("--graph", help="snap to this local road graph instead of OSRM (see local_router.py)")
+    parser.add_argument("--junctions", default="none",
+                        help="'overpass' to query Overpass, a saved Overpass JSON file, or 'none' (default)")
+    parser.add_argument("--overpass-url", default=OVERPASS_URL)
+    parser.add_argument("--no-names", action="store_true", help="do not reverse-geocode unnamed stations")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    store = load_stations(args.source, precompute_dir=None)
+    client = LocalGraphRouter.from_path(args.graph) if args.graph else OSRMClient(args.osrm_server)
+    pipeline.set_concurrency("osrm", args.osrm_concurrency)
+    junctions = None
+    if args.junctions == "overpass":
+        try:
+            junctions = fetch_junctions(store.lat, store.lon, url=args.overpass_url)
+        except (requests.RequestException, ValueError) as e:
+            # Afritten zijn optioneel: zonder Overpass gaat de rest gewoon door
+            logger.warning("Overpass niet bereikbaar, afritten overgeslagen: %r", e)
+    elif args.junctions != "none":
+        with open(args.junctions, encoding="utf-8") as f:
+            junctions = json.load(f)
+
+    road = precompute(store, client, junctions=junctions, names=not args.no_names)
+    road.write(args.out)
+    print("{} stations, versie {}: {snapped} gesnapt, {with_junction} met afrit, {named} namen aangevuld "
+          "in {seconds} s -> {}".format(len(store), store.version, args.out, **road.meta))
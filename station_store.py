@@ -0,0 +1,334 @@
+"""Columnar tank-station store loaded from CSV or Parquet.
+
+Stations live in a NumPy structured array (one row per station, fixed-width
+columns) plus a separate array of unique names. After the first load both
+are written as ``.npy`` snapshots next to a small ``meta.json``; later starts
+memory-map the snapshot instead of parsing the source, so startup time and
+resident memory stay flat as the dataset grows.
+
+Source columns: ``name``, ``lat``, ``lon`` and optionally ``country``
+(ISO 3166 alpha-2) and ``flags`` (integer attribute bitmask).
+
+The offline job in ``station_precompute.py`` adds road-snapped positions,
+access bearings, nearest motorway junctions and names for unnamed stations
+(:class:`PrecomputedStations`). They are attached to the store when they
+were computed for the same dataset version.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_SOURCE = os.environ.get("STATIONS_PATH", os.path.join(DATA_DIR, "tankstations.csv"))
+DEFAULT_SNAPSHOT_DIR = os.environ.get(
+    "STATIONS_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "stations"))
+DEFAULT_PRECOMPUTE_DIR = os.environ.get(
+    "STATIONS_PRECOMPUTE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "stations-road"))
+
+STATION_DTYPE = np.dtype([
+    ("name_id", "<i4"),
+    ("lat", "<f8"),
+    ("lon", "<f8"),
+    ("country", "S2"),
+    ("flags", "<u4"),
+])
+
+# Naam voor stations zonder (bruikbare) naam in de bron
+UNKNOWN_NAME = "OG tanklocatie"
+_MISSING_NAMES = {"", "nan", "none", "null", "n/a"}
+
+# Per station, in dezelfde rijvolgorde; NaN of -1 waar niets bekend is
+PRECOMPUTED_DTYPE = np.dtype([
+    ("snap_lat", "<f8"),
+    ("snap_lon", "<f8"),
+    ("snap_m", "<f4"),
+    ("bearing", "<f4"),
+    ("name_id", "<i4"),
+    ("junction_id", "<i4"),
+    ("junction_km", "<f4"),
+])
+# Verder van de weg dan dit is de gesnapte positie waarschijnlijk een verkeerde weg; dan de bronpositie houden
+MAX_SNAP_M = 250.0
+
+# 2: strengere naamopschoning (lege haakjes, lijst-repr)
+SNAPSHOT_FORMAT = 2
+PRECOMPUTE_FORMAT = 1
+
+
+def clean_name(name):
+    """Tidy a source name; placeholder values such as "nan" become "".
+
+    Collapses whitespace, drops empty brackets (``"Randweg 18 ( )"``) and
+    unwraps list reprs (``"['s-Hertogenbosch]"``, ``"['Parkweg 85']"``).
+    """
+    name = re.sub(r"\s+", " ", str(name if name is not None else "")).strip()
+    # Lijst-repr uit een export: buitenste haken weg, en aanhalingstekens alleen als ze aan beide kanten staan
+    while len(name) >= 2 and name[0] == "[" and name[-1] == "]":
+        name = name[1:-1].strip()
+        if len(name) >= 2 and name[0] == name[-1] and name[0] in "'\"":
+            name = name[1:-1].strip()
+    name = re.sub(r"\s*[(\[{]\s*[)\]}]", "", name)
+    name = re.sub(r"\s+", " ", name).strip()
+    return "" if name.lower() in _MISSING_NAMES else name
+
+
+class PrecomputedStations:
+    """Road positions, access bearings, motorway junctions and filled-in names per station row.
+
+    ``bearing`` is the compass bearing from the road position to the station,
+    i.e. the direction of its access road. ``names`` holds reverse-geocoded
+    names for stations without one; ``junctions`` the junction labels.
+    """
+
+    def __init__(self, records, names, junctions, station_version, meta=None):
+        self.records = records
+        self.names = names
+        self.junctions = junctions
+        self.station_version = station_version
+        self.meta = dict(meta or {})
+        digest = hashlib.sha1(np.ascontiguousarray(records).tobytes())
+        digest.update(np.asarray(names, dtype="U").tobytes())
+        digest.update(np.asarray(junctions, dtype="U").tobytes())
+        self.version = digest.hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.records)
+
+    def write(self, out_dir):
+        """Write ``road.npy``, ``names.npy``, ``junctions.npy`` and ``meta.json`` to ``out_dir``."""
+        os.makedirs(out_dir, exist_ok=True)
+        np.save(os.path.join(out_dir, "road.npy"), np.ascontiguousarray(self.records))
+        np.save(os.path.join(out_dir, "names.npy"), np.asarray(self.names, dtype="U"))
+        np.save(os.path.join(out_dir, "junctions.npy"), np.asarray(self.junctions, dtype="U"))
+        meta = dict(self.meta, format=PRECOMPUTE_FORMAT, station_version=self.station_version, count=len(self))
+        tmp = os.path.join(out_dir, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(out_dir, "meta.json"))
+
+    @classmethod
+    def open(cls, out_dir):
+        """Memory-map a directory written by :meth:`write`."""
+        with open(os.path.join(out_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != PRECOMPUTE_FORMAT:
+            raise ValueError("Onbekend formaat voor voorberekende stationsdata: {!r}".format(meta.get("format")))
+        records = np.load(os.path.join(out_dir, "road.npy"), mmap_mode="r")
+        names = np.load(os.path.join(out_dir, "names.npy"))
+        junctions = np.load(os.path.join(out_dir, "junctions.npy"))
+        return cls(records, names, junctions, meta["station_version"], meta)
+
+
+class StationStore:
+    """Stations as columns; row ``i`` is the same station everywhere (index, planner, UI)."""
+
+    def __init__(self, records, names, version):
+        self.records = records
+        self.names = names
+        self.version = version
+        self.road = None
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def lat(self):
+        return self.records["lat"]
+
+    @property
+    def lon(self):
+        return self.records["lon"]
+
+    @property
+    def cache_version(self):
+        """Dataset version plus that of the attached precomputed data; key for derived caches."""
+        return self.version if self.road is None else "{}+{}".format(self.version, self.road.version)
+
+    def attach(self, road):
+        """Use :class:`PrecomputedStations` for positions and missing names; None detaches."""
+        if road is not None and (road.station_version != self.version or len(road) != len(self)):
+            raise ValueError("Voorberekende stationsdata hoort bij versie {}, niet bij {}".format(
+                road.station_version, self.version))
+        self.road = road
+
+    def name(self, i):
+        name = str(self.names[self.records["name_id"][i]])
+        if not name and self.road is not None:
+            name_id = self.road.records["name_id"][i]
+            name = str(self.road.names[name_id]) if name_id >= 0 else ""
+        return name or UNKNOWN_NAME
+
+    def country(self, i):
+        return self.records["country"][i].decode("ascii")
+
+    def junction(self, i):
+        """``(label, distance_km)`` of the nearest motorway junction, or None when unknown."""
+        if self.road is None or self.road.records["junction_id"][i] < 0:
+            return None
+        row = self.road.records[i]
+        return str(self.road.junctions[row["junction_id"]]), float(row["junction_km"])
+
+    def _positions(self, indices):
+        """``(lats, lons)`` to route to: the road position when it was snapped close enough."""
+        lats = self.records["lat"][indices]
+        lons = self.records["lon"][indices]
+        if self.road is None:
+            return lats, lons
+        road = self.road.records[indices]
+        snapped = road["snap_m"] <= MAX_SNAP_M
+        return np.where(snapped, road["snap_lat"], lats), np.where(snapped, road["snap_lon"], lons)
+
+    def station(self, i):
+        """Station ``i`` as a ``(name, lat, lon)`` tuple, at its road position when known."""
+        lat, lon = self._positions(i)
+        return (self.name(i), float(lat), float(lon))
+
+    def coords(self, indices):
+        """``(lat, lon)`` tuples for the given rows, at their road positions when known."""
+        lats, lons = self._positions(np.asarray(indices, dtype=np.int64))
+        return list(zip(lats.tolist(), lons.tolist()))
+
+    @classmethod
+    def from_frame(cls, df):
+        """Validate a DataFrame and build a store.
+
+        Rows with missing or out-of-range coordinates are dropped, names are
+        cleaned, and duplicates (same cleaned name and position to ~1 m) keep
+        their first occurrence.
+        """
+        missing = {"name", "lat", "lon"} - set(df.columns)
+        if missing:
+            raise ValueError("Ontbrekende kolommen in stationsbestand: {}".format(", ".join(sorted(missing))))
+        df = pd.DataFrame({
+            "name": df["name"].map(clean_name),
+            "lat": pd.to_numeric(df["lat"], errors="coerce"),
+            "lon": pd.to_numeric(df["lon"], errors="coerce"),
+            "country": (df["country"] if "country" in df else pd.Series("", index=df.index))
+                .fillna("").astype(str).str.strip().str.upper().str[:2],
+            "flags": pd.to_numeric(df["flags"], errors="coerce").fillna(0).astype(np.uint32)
+                if "flags" in df else 0,
+        })
+        valid = df["lat"].between(-90, 90) & df["lon"].between(-180, 180)
+        df = df[valid]
+        df = df.loc[~pd.DataFrame({
+            "name": df["name"], "lat": df["lat"].round(5), "lon": df["lon"].round(5),
+        }).duplicated()]
+
+        names, name_ids = np.unique(df["name"].to_numpy(dtype=str), return_inverse=True)
+        records = np.empty(len(df), dtype=STATION_DTYPE)
+        records["name_id"] = name_ids
+        records["lat"] = df["lat"].to_numpy()
+        records["lon"] = df["lon"].to_numpy()
+        records["country"] = df["country"].str.encode("ascii", errors="replace").to_numpy()
+        records["flags"] = df["flags"].to_numpy()
+        digest = hashlib.sha1(records.tobytes())
+        digest.update(names.astype("U").tobytes())
+        return cls(records, names, digest.hexdigest()[:16])
+
+    @classmethod
+    def from_file(cls, path):
+        """Read a ``.csv`` or ``.parquet`` file (Parquet needs pyarrow or fastparquet)."""
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        else:
+            # keep_default_na=False: "nan" als naam is een ontbrekende naam, geen float
+            df = pd.read_csv(path, dtype={"name": str, "country": str}, keep_default_na=False)
+        return cls.from_frame(df)
+
+    def write_snapshot(self, snapshot_dir, source=None):
+        """Write ``stations.npy``, ``names.npy`` and ``meta.json`` to ``snapshot_dir``."""
+        os.makedirs(snapshot_dir, exist_ok=True)
+        np.save(os.path.join(snapshot_dir, "stations.npy"), np.ascontiguousarray(self.records))
+        np.save(os.path.join(snapshot_dir, "names.npy"), self.names.astype("U"))
+        meta = {"format": SNAPSHOT_FORMAT, "version": self.version, "count": len(self)}
+        if source:
+            st = os.stat(source)
+            meta["source"] = {"path": os.path.abspath(source), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        # meta.json als laatste schrijven: een half geschreven snapshot wordt nooit als geldig gezien
+        tmp = os.path.join(snapshot_dir, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(snapshot_dir, "meta.json"))
+
+    @classmethod
+    def from_snapshot(cls, snapshot_dir):
+        """Memory-map a snapshot written by :meth:`write_snapshot`."""
+        with open(os.path.join(snapshot_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        records = np.load(os.path.join(snapshot_dir, "stations.npy"), mmap_mode="r")
+        names = np.load(os.path.join(snapshot_dir, "names.npy"), mmap_mode="r")
+        return cls(records, names, meta["version"])
+
+
+def _snapshot_is_fresh(snapshot_dir, source):
+    try:
+        with open(os.path.join(snapshot_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        st = os.stat(source)
+    except (OSError, ValueError):
+        return False
+    recorded = meta.get("source") or {}
+    return (meta.get("format") == SNAPSHOT_FORMAT
+            and recorded.get("path") == os.path.abspath(source)
+            and recorded.get("size") == st.st_size
+            and recorded.get("mtime_ns") == st.st_mtime_ns)
+
+
+def _attach_precomputed(store, precompute_dir):
+    try:
+        road = PrecomputedStations.open(precompute_dir)
+    except (OSError, ValueError, KeyError):
+        return store
+    # Berekend voor een andere versie van het bestand: negeren tot de job opnieuw heeft gedraaid
+    if road.station_version == store.version and len(road) == len(store):
+        store.attach(road)
+    return store
+
+
+def load_stations(source=DEFAULT_SOURCE, snapshot_dir=DEFAULT_SNAPSHOT_DIR, precompute_dir=DEFAULT_PRECOMPUTE_DIR):
+    """Load the station store, using (and refreshing) the snapshot when possible.
+
+    Precomputed road data in ``precompute_dir`` is attached when it matches
+    the dataset version.
+    """
+    if snapshot_dir and _snapshot_is_fresh(snapshot_dir, source):
+        store = StationStore.from_snapshot(snapshot_dir)
+    else:
+        store = StationStore.from_file(source)
+        if snapshot_dir:
+            try:
+                store.write_snapshot(snapshot_dir, source=source)
+            except OSError:
+                # Alleen-lezen bestandssysteem: dan maar zonder snapshot
+                pass
+    return _attach_precomputed(store, precompute_dir) if precompute_dir else store
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_station_store():
+    """Process-wide station store, loaded on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = load_stations()
+        return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate a station file and (re)build its snapshot.")
+    parser.add_argument("source", nargs="?", default=DEFAULT_SOURCE, help=".csv or .parquet station file")
+    parser.add_argument("--snapshot-dir", default=DEFAULT_SNAPSHOT_DIR)
+    args = parser.parse_args()
+    store = StationStore.from_file(args.source)
+    store.write_snapshot(args.snapshot_dir, source=args.source)
+    print("{} stations, versie {}, snapshot in {}".format(len(store), store.version, args.snapshot_dir))
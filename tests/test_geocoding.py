@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+import geocoding
+import metrics
+
+
+class MemoryCache(dict):
+    def get(self, key, ttl=None):
+        return dict.get(self, key)
+
+    def put(self, key, value):
+        self[key] = value
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    c = MemoryCache()
+    monkeypatch.setattr(geocoding, "_cache", c)
+    return c
+
+
+@pytest.fixture
+def with_metrics():
+    was = metrics.enabled()
+    metrics.enable(True)
+    yield
+    metrics.enable(was)
+
+
+def test_geocode_many_uses_cache_and_keeps_order(cache):
+    cache[geocoding.normalize_address("Parkweg 85, Zeist")] = {"loc": [52.09, 5.23], "at": time.time()}
+    cache[geocoding.normalize_address("Nergens 1")] = {"loc": None, "at": time.time()}
+    result = geocoding.geocode_many(["Parkweg 85, Zeist", "52.1, 5.1", "", "parkweg  85 ,zeist", "Nergens 1"])
+    assert result == [(52.09, 5.23), (52.1, 5.1), None, (52.09, 5.23), None]
+
+
+def test_geocode_many_is_its_own_stage(cache, with_metrics):
+    with metrics.trace("test") as trace:
+        geocoding.geocode_many(["52.1, 5.1", "52.2, 5.2"])
+    assert trace.as_dict()["stages"]["geocode_many"]["calls"] == 1
+    with metrics.trace("test") as trace:
+        geocoding._reverse_label({"address": {"road": "Parkweg"}})
+    assert "geocode_many" not in trace.as_dict()["stages"]
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ({"address": {"road": "Parkweg", "house_number": "85", "town": "Zeist"}}, "Parkweg 85, Zeist"),
+    ({"properties": {"street": "Via Roma", "housenumber": "3", "city": "Milano"}}, "Via Roma 3, Milano"),
+    ({"address": {"village": "Oudenrijn"}}, "Oudenrijn"),
+    ({}, None),
+])
+def test_reverse_label(raw, expected):
+    assert geocoding._reverse_label(raw) == expected
+
+
+def test_reverse_geocode_is_cached(cache, monkeypatch):
+    monkeypatch.setattr(geocoding, "_rate_limited", lambda *args: pytest.fail("provider called"))
+    cache["reverse:52.09000,5.23000"] = {"label": "Parkweg 85, Zeist", "at": time.time()}
+    assert geocoding.reverse_geocode(52.09, 5.23) == "Parkweg 85, Zeist"
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from corridor import stations_along_route
+from lane_cache import LaneCache
+from local_router import LocalGraphRouter, RoadGraph
+from osrm_client import OSRMClient
+from planner import LanePlan
+from routing import backend_id
+from station_index import StationIndex
+from station_store import StationStore
+
+
+def _line_graph(speed_kmh):
+    # Drie knooppunten op een rij langs de A2, ~10 km uit elkaar
+    return RoadGraph.from_edges([52.0, 52.09, 52.18], [5.0, 5.0, 5.0], [0, 1], [1, 2], speed_kmh)
+
+
+def test_graph_version_depends_on_content():
+    assert _line_graph(100).version == _line_graph(100).version
+    assert _line_graph(100).version != _line_graph(80).version
+
+
+def test_graph_version_survives_write_and_open(tmp_path):
+    graph = _line_graph(100)
+    graph.write(str(tmp_path / "graph"))
+    opened = RoadGraph.open(str(tmp_path / "graph"))
+    assert opened.version == graph.version
+    np.testing.assert_array_equal(opened.fwd_head, graph.fwd_head)
+
+
+def test_backend_id_per_graph(tmp_path):
+    _line_graph(100).write(str(tmp_path / "a"))
+    _line_graph(80).write(str(tmp_path / "b"))
+    a = LocalGraphRouter.from_path(str(tmp_path / "a"))
+    b = LocalGraphRouter.from_path(str(tmp_path / "b"))
+    assert backend_id(a) != backend_id(b)
+    assert backend_id(a) == backend_id(LocalGraphRouter.from_path(str(tmp_path / "a")))
+    assert backend_id(OSRMClient("http://osrm.example/", cache_path=None)) == "http://osrm.example"
+
+
+def test_lane_cache_key_differs_per_graph(tmp_path):
+    lanes = LaneCache(path=str(tmp_path / "lanes.sqlite"))
+    a = LocalGraphRouter(_line_graph(100))
+    b = LocalGraphRouter(_line_graph(80))
+    start, end = (52.0, 5.0), (52.18, 5.0)
+    lanes.put(start, end, "v1", ["a"], interval_km=50, backend=backend_id(a))
+    assert lanes.get(start, end, "v1", interval_km=50, backend=backend_id(a)) == ["a"]
+    assert lanes.get(start, end, "v1", interval_km=50, backend=backend_id(b)) is None
+
+
+def test_same_node_route_has_two_vertices():
+    router = LocalGraphRouter(_line_graph(100))
+    route, legs = router.route_legs([(52.0, 5.0), (52.001, 5.0), (52.0005, 5.0)])
+    assert route.shape == (2, 2)
+    np.testing.assert_array_equal(route[0], route[1])
+    assert legs.tolist() == [0, 0, 1]
+
+
+def test_corridor_pads_cum_with_a_one_point_route():
+    index = StationIndex([52.0, 53.0], [5.01, 5.0])
+    hits = stations_along_route([[5.0, 52.0]], index, 5.0, cum=np.zeros(1))
+    assert hits.indices.tolist() == [0]
+    assert hits.offset_km.tolist() == [0.0]
+
+
+def test_lane_plan_when_start_and_end_snap_to_one_node():
+    stations = StationStore.from_frame(pd.DataFrame({"name": ["Oost"], "lat": [52.0], "lon": [5.01]}))
+    lane = LanePlan((52.0, 5.0), (52.001, 5.0), stations, client=LocalGraphRouter(_line_graph(100)))
+    assert lane.ok and len(lane.cum) == 2
+    lane.plan(100, 25)
@@ -0,0 +1,175 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pytest
+
+import cache
+from cache import DiskCache
+from osrm_client import OSRMClient
+from route_geometry import encode_polyline
+
+
+class FakeOSRM(BaseHTTPRequestHandler):
+    """Minimal OSRM: ``route`` returns the waypoints as polyline6, ``table`` straight-line matrices."""
+
+    def do_GET(self):
+        server = self.server
+        server.paths.append(self.path)
+        if server.fail > 0:
+            server.fail -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        url = urlsplit(self.path)
+        service, _, _, coords = url.path.strip("/").split("/", 3)
+        points = [tuple(map(float, p.split(","))) for p in coords.split(";")]
+        if service == "route":
+            body = {"code": "Ok", "routes": [{"geometry": encode_polyline(points), "distance": 1.0, "duration": 1.0}]}
+        else:
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            sources = [int(i) for i in query["sources"].split(";")] if "sources" in query else range(len(points))
+            dests = [int(i) for i in query["destinations"].split(";")] if "destinations" in query else range(len(points))
+            dist = [[abs(points[i][0] - points[j][0]) * 1e5 for j in dests] for i in sources]
+            body = {"code": "Ok", "distances": dist, "durations": [[d / 20 for d in row] for row in dist]}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), FakeOSRM)
+    srv.paths, srv.fail = [], 0
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    srv.url = "http://127.0.0.1:{}".format(srv.server_address[1])
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "osrm.sqlite")
+
+
+AMS, UTR = (52.3731, 4.8922), (52.0907, 5.1214)
+
+
+def test_memory_and_disk_hits(server, cache_path):
+    client = OSRMClient(server.url, cache_path=cache_path, backoff=0)
+    route = client.route([AMS, UTR])
+    assert route.shape == (2, 2)
+    assert np.allclose(route[0], [AMS[1], AMS[0]], atol=1e-5)
+    client.route([AMS, UTR])
+    assert client.stats["misses"] == 1
+    assert client.stats["memory_hits"] == 1
+
+    # Nieuwe client, zelfde SQLite-bestand: antwoord van schijf, zonder netwerk
+    fresh = OSRMClient(server.url, cache_path=cache_path, backoff=0)
+    assert np.allclose(fresh.route([AMS, UTR]), route)
+    assert fresh.stats["disk_hits"] == 1
+    assert fresh.stats["misses"] == 0
+    assert len(server.paths) == 1
+
+
+def test_rounded_waypoints_share_a_key(server):
+    client = OSRMClient(server.url, cache_path=None, backoff=0, precision=5)
+    client.route([AMS, UTR])
+    # Verschil onder de afronding (1e-5°, ~1 m): zelfde sleutel, geen tweede verzoek
+    client.route([(AMS[0] + 2e-6, AMS[1] - 2e-6), UTR])
+    assert client.stats == {"memory_hits": 1, "disk_hits": 0, "misses": 1, "errors": 0}
+    # Verschil boven de afronding: wel een nieuw verzoek
+    client.route([(AMS[0] + 1e-4, AMS[1]), UTR])
+    assert client.stats["misses"] == 2
+    assert len(server.paths) == 2
+
+
+def test_503_is_retried(server):
+    server.fail = 2
+    client = OSRMClient(server.url, cache_path=None, retries=3, backoff=0)
+    assert len(client.route([AMS, UTR])) == 2
+    assert len(server.paths) == 3
+    assert client.stats["errors"] == 0
+
+
+def test_table_with_sources_and_destinations(server):
+    client = OSRMClient(server.url, cache_path=None, backoff=0)
+    durations, distances = client.table([AMS, UTR, (51.92, 4.48)], sources=[0], destinations=[1, 2])
+    assert durations.shape == distances.shape == (1, 2)
+    assert "sources=0" in server.paths[0] and "destinations=1;2" in server.paths[0]
+
+
+def test_connection_error_gives_empty_route(cache_path):
+    # Vrije poort zonder server erachter
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = OSRMClient("http://127.0.0.1:{}".format(port), cache_path=cache_path, retries=0, timeout=(1, 1))
+    route = client.route([AMS, UTR])
+    assert route.shape == (0, 2)
+    assert client.stats["errors"] == 1
+    assert client.table([AMS, UTR]) is None
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(cache.time, "time", c)
+    return c
+
+
+def test_disk_cache_ttl(tmp_path, clock):
+    disk = DiskCache(str(tmp_path / "c.sqlite"), ttl=60)
+    disk.put("a", {"x": 1})
+    clock.now += 59
+    assert disk.get("a") == {"x": 1}
+    # Per aanroep een kortere TTL (zoals voor negatieve geocode-resultaten)
+    assert disk.get("a", ttl=30) is None
+    disk.put("b", [1, 2])
+    clock.now += 61
+    assert disk.get("b") is None
+    assert len(disk) == 0
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path, clock):
+    disk = DiskCache(str(tmp_path / "c.sqlite"), max_entries=3)
+    for key in "abc":
+        disk.put(key, key)
+        clock.now += 1
+    assert disk.get("a") == "a"  # a is nu het meest recent gebruikt
+    clock.now += 1
+    disk.put("d", "d")
+    assert len(disk) == 3
+    assert disk.get("b") is None
+    assert [disk.get(k) for k in "acd"] == ["a", "c", "d"]
+
+
+def test_disk_cache_purge_and_clear(tmp_path, clock):
+    disk = DiskCache(str(tmp_path / "c.sqlite"), ttl=10)
+    disk.put("old", 1)
+    clock.now += 20
+    disk.put("new", 2)
+    disk.purge_expired()
+    assert len(disk) == 1
+    disk.clear()
+    assert len(disk) == 0
@@ -0,0 +1,84 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from refuel_planner import plan_refuel_stops
+
+
+def brute_force(offsets, length, max_range, cost, access, minimize):
+    """Best ``(n_stops, total_cost)`` over every subset of candidates, or None when none fits."""
+    order = sorted(range(len(offsets)), key=lambda k: offsets[k])
+    best = None
+    for r in range(len(order) + 1):
+        for subset in itertools.combinations(order, r):
+            nodes = [(0.0, 0.0)] + [(offsets[k], access[k]) for k in subset] + [(length, 0.0)]
+            if any(b_off + b_acc - (a_off - a_acc) > max_range + 1e-9
+                   for (a_off, a_acc), (b_off, b_acc) in zip(nodes[:-1], nodes[1:])):
+                continue
+            total = sum(cost[k] for k in subset)
+            key = (r, total) if minimize == "stops" else (total, r)
+            if best is None or key[0] < best[0] - 1e-9 or (abs(key[0] - best[0]) <= 1e-9 and key[1] < best[1] - 1e-9):
+                best = key
+    if best is None:
+        return None
+    return best if minimize == "stops" else (best[1], best[0])
+
+
+def valid_chain(plan, offsets, length, max_range, access):
+    nodes = [(0.0, 0.0)] + [(offsets[k], access[k]) for k in plan.stops] + [(length, 0.0)]
+    return all(a_off <= b_off and b_off + b_acc - (a_off - a_acc) <= max_range + 1e-9
+               for (a_off, a_acc), (b_off, b_acc) in zip(nodes[:-1], nodes[1:]))
+
+
+@pytest.mark.parametrize("minimize", ["stops", "detour"])
+def test_matches_brute_force(minimize):
+    rng = np.random.default_rng(6)
+    for _ in range(300):
+        n = int(rng.integers(0, 9))
+        length = float(rng.uniform(200, 1000))
+        max_range = float(rng.uniform(150, 400))
+        offsets = rng.uniform(0, length, n).tolist()
+        cost = rng.uniform(0, 30, n).round(1).tolist()
+        access = rng.uniform(0, 20, n).tolist()
+        plan = plan_refuel_stops(offsets, length, max_range, cost=cost, access_km=access, minimize=minimize)
+        expected = brute_force(offsets, length, max_range, cost, access, minimize)
+        if expected is None:
+            assert not plan.feasible
+            continue
+        assert plan.feasible
+        assert valid_chain(plan, offsets, length, max_range, access)
+        assert len(plan.stops) == expected[0]
+        assert plan.total_cost == pytest.approx(expected[1], abs=1e-6)
+
+
+def test_no_stop_needed():
+    plan = plan_refuel_stops([50.0, 120.0], 200.0, 250.0)
+    assert plan.feasible and len(plan.stops) == 0 and plan.total_cost == 0.0
+
+
+def test_fewest_stops_beats_cheaper_detours():
+    # Eén dure stop halverwege tegen twee goedkope
+    plan = plan_refuel_stops([150.0, 100.0, 200.0], 300.0, 160.0, cost=[50.0, 1.0, 1.0])
+    assert plan.stops.tolist() == [0]
+    plan = plan_refuel_stops([150.0, 100.0, 200.0], 300.0, 160.0, cost=[50.0, 1.0, 1.0], minimize="detour")
+    assert plan.stops.tolist() == [1, 2]
+
+
+def test_access_distance_counts_both_ways():
+    # Zonder toegangsafstand past 0 -> 100 -> 200, met 5 km heen en terug niet meer
+    assert plan_refuel_stops([100.0], 200.0, 100.0).feasible
+    assert not plan_refuel_stops([100.0], 200.0, 100.0, access_km=[5.0]).feasible
+
+
+def test_infeasible_reports_first_gap():
+    plan = plan_refuel_stops([100.0, 500.0], 800.0, 250.0)
+    assert not plan.feasible
+    assert plan.total_cost == math.inf
+    assert plan.gap_km == (350.0, 500.0)
+
+
+def test_rejects_unknown_objective():
+    with pytest.raises(ValueError):
+        plan_refuel_stops([], 100.0, 50.0, minimize="cheapest")
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from route_geometry import cumulative_distance, decode_polyline, encode_polyline, route_length
+
+# Relatieve afwijking t.o.v. opgetelde geopy.geodesic-afstanden: Lambert ~1e-6, bol tot ~0,5%
+ELLIPSOIDAL_RTOL = 1e-5
+HAVERSINE_RTOL = 5e-3
+
+
+def dense_line(n=2000, start=(11.97, 57.70), end=(9.19, 45.46), seed=0):
+    """Wandering ``[lon, lat]`` polyline from Göteborg to Milano."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, n)
+    lon = start[0] + (end[0] - start[0]) * t + 0.1 * np.sin(7 * np.pi * t) + rng.normal(0, 1e-3, n)
+    lat = start[1] + (end[1] - start[1]) * t + 0.05 * np.sin(3 * np.pi * t) + rng.normal(0, 1e-3, n)
+    return np.column_stack([lon, lat])
+
+
+def geodesic_total(coords):
+    return sum(geodesic((a[1], a[0]), (b[1], b[0])).km for a, b in zip(coords[:-1], coords[1:]))
+
+
+@pytest.fixture(scope="module")
+def line():
+    coords = dense_line()
+    return coords, geodesic_total(coords)
+
+
+def test_ellipsoidal_matches_geodesic(line):
+    coords, expected = line
+    assert route_length(coords, method="ellipsoidal") == pytest.approx(expected, rel=ELLIPSOIDAL_RTOL)
+
+
+def test_haversine_matches_geodesic(line):
+    coords, expected = line
+    assert route_length(coords) == pytest.approx(expected, rel=HAVERSINE_RTOL)
+
+
+def test_cumulative_distance_ends_at_total(line):
+    coords, _ = line
+    cum = cumulative_distance(coords, method="ellipsoidal")
+    assert cum[0] == 0.0
+    assert np.all(np.diff(cum) >= 0)
+    assert cum[-1] == pytest.approx(route_length(coords, method="ellipsoidal"))
+
+
+@pytest.mark.parametrize("coords", [[], [[5.1, 52.1]]])
+def test_short_inputs_have_zero_length(coords):
+    assert route_length(coords) == 0.0
+    assert route_length(coords, method="ellipsoidal") == 0.0
+    assert cumulative_distance(coords).tolist() == [0.0]
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        route_length([[5.0, 52.0], [5.1, 52.1]], method="vincenty")
+
+
+def test_polyline_round_trip(line):
+    coords = np.round(line[0], 6)
+    assert np.allclose(decode_polyline(encode_polyline(coords)), coords, atol=1e-6)
+    assert np.allclose(decode_polyline(encode_polyline(coords, precision=5), precision=5), coords, atol=1e-5)
+
+
+def test_polyline_known_value():
+    # Voorbeeld uit de Google-documentatie (precisie 5)
+    encoded = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+    expected = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    assert np.allclose(decode_polyline(encoded, precision=5), expected)
+    assert encode_polyline(expected, precision=5) == encoded
+
+
+@pytest.mark.parametrize("coords", [[], [[5.123456, 52.654321]]])
+def test_polyline_short_inputs(coords):
+    assert np.allclose(decode_polyline(encode_polyline(coords)), np.reshape(coords, (-1, 2)))
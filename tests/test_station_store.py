@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from station_store import UNKNOWN_NAME, StationStore, clean_name, load_stations
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("  Parkweg   85 ", "Parkweg 85"),
+    ("Randweg 18 ( )", "Randweg 18"),
+    ("Randweg 18 ()", "Randweg 18"),
+    ("Hoofdweg 1 (A2)", "Hoofdweg 1 (A2)"),
+    ("['s-Hertogenbosch]", "'s-Hertogenbosch"),
+    ("['Parkweg 85']", "Parkweg 85"),
+    ('["Dolderweg 48"]', "Dolderweg 48"),
+    ("'s-Gravenzande", "'s-Gravenzande"),
+    ("[]", ""),
+    ("nan", ""),
+    ("NaN", ""),
+    (None, ""),
+    (" n/a ", ""),
+])
+def test_clean_name(raw, expected):
+    assert clean_name(raw) == expected
+
+
+def test_from_frame_validates_and_deduplicates():
+    df = pd.DataFrame({
+        "name": ["Randweg 18 ( )", "Randweg 18", "['s-Hertogenbosch]", "nan", "Kapot", "Ver weg"],
+        "lat": [52.698176, 52.6981761, 51.685994, 52.0, "x", 95.0],
+        "lon": [5.747978, 5.7479781, 5.281339, 5.0, 5.0, 5.0],
+    })
+    store = StationStore.from_frame(df)
+    # Dubbel na opschonen, ongeldige en buiten bereik liggende coördinaten vallen weg
+    assert len(store) == 3
+    assert [store.name(i) for i in range(len(store))] == ["Randweg 18", "'s-Hertogenbosch", UNKNOWN_NAME]
+    assert store.station(1) == ("'s-Hertogenbosch", 51.685994, 5.281339)
+    assert store.coords([0, 2]) == [(52.698176, 5.747978), (52.0, 5.0)]
+
+
+def test_missing_columns():
+    with pytest.raises(ValueError):
+        StationStore.from_frame(pd.DataFrame({"name": ["a"], "lat": [1.0]}))
+
+
+def test_snapshot_round_trip(tmp_path):
+    source = tmp_path / "stations.csv"
+    source.write_text("name,lat,lon,country,flags\nRandweg 18 ( ),52.698176,5.747978,NL,1\nnan,51.0,4.0,,0\n")
+    snapshot = tmp_path / "snapshot"
+    first = load_stations(str(source), snapshot_dir=str(snapshot), precompute_dir=None)
+    again = load_stations(str(source), snapshot_dir=str(snapshot), precompute_dir=None)
+    assert isinstance(again.records, np.memmap)
+    assert again.version == first.version
+    assert [again.name(i) for i in range(2)] == ["Randweg 18", UNKNOWN_NAME]
+    assert again.country(0) == "NL"
+
+
+def test_bundled_dataset_has_clean_names():
+    store = load_stations(snapshot_dir=None, precompute_dir=None)
+    names = {store.name(i) for i in range(len(store))}
+    assert not any("( )" in n or n.startswith("[") or n.endswith("]") for n in names)
@@ -0,0 +1,92 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from trip_planner import END_MODES, _cost_matrix, solve_order, tour_cost
+
+
+def random_matrix(n, rng, asymmetric=True):
+    pts = rng.uniform(0, 100, (n, 2))
+    d = np.linalg.norm(pts[:, None] - pts[None], axis=2) * 60
+    if asymmetric:
+        # Eenrichtingsverkeer en opritten: heen en terug verschillen
+        d = d * rng.uniform(1.0, 1.4, (n, n))
+    np.fill_diagonal(d, 0.0)
+    return d
+
+
+def brute_force(durations, end):
+    n = len(durations)
+    cost = _cost_matrix(durations)
+    if end == "start":
+        tours = ([0, *p, 0] for p in itertools.permutations(range(1, n)))
+    elif end == "last":
+        tours = ([0, *p, n - 1] for p in itertools.permutations(range(1, n - 1)))
+    else:
+        tours = ([0, *p] for p in itertools.permutations(range(1, n)))
+    return min(float(cost[t[:-1], t[1:]].sum()) for t in tours)
+
+
+def check_shape(order, n, end):
+    assert order[0] == 0
+    if end == "start":
+        assert order[-1] == 0 and sorted(order[:-1]) == list(range(n))
+    else:
+        assert sorted(order) == list(range(n))
+        if end == "last":
+            assert order[-1] == n - 1
+
+
+@pytest.mark.parametrize("end", END_MODES)
+def test_matches_brute_force_on_small_instances(end):
+    rng = np.random.default_rng(15)
+    worst = 0.0
+    for _ in range(60):
+        n = int(rng.integers(2, 8))
+        durations = random_matrix(n, rng)
+        order, cost = solve_order(durations, end=end)
+        check_shape(order, n, end)
+        assert cost == pytest.approx(tour_cost(durations, order))
+        best = brute_force(durations, end)
+        assert cost >= best - 1e-6
+        worst = max(worst, cost / best - 1 if best > 0 else 0.0)
+    # Lokale zoektocht (2-opt + Or-opt): niet altijd optimaal, wel dichtbij
+    assert worst <= 0.10
+
+
+@pytest.mark.parametrize("end", END_MODES)
+def test_exact_up_to_four_points(end):
+    rng = np.random.default_rng(4)
+    for _ in range(50):
+        n = int(rng.integers(1, 5))
+        durations = random_matrix(n, rng)
+        order, cost = solve_order(durations, end=end)
+        if n == 1:
+            assert order in ([0], [0, 0])
+            continue
+        assert cost == pytest.approx(brute_force(durations, end))
+
+
+def test_unreachable_pairs_are_penalized():
+    durations = np.array([[0.0, np.nan, np.nan], [np.nan, 0.0, np.nan], [np.nan, np.nan, 0.0]])
+    cost = _cost_matrix(durations)
+    off = ~np.eye(3, dtype=bool)
+    # Alles onbereikbaar: de straf mag niet nul worden
+    assert np.all(cost[off] > 0) and np.all(np.diag(cost) == 0)
+
+    durations = np.array([[0.0, 100.0, 200.0], [np.nan, 0.0, 50.0], [150.0, 80.0, 0.0]])
+    cost = _cost_matrix(durations)
+    assert cost[1, 0] > 200.0 * 3
+    # De onbereikbare rit 1 -> 0 wordt vermeden als het kan
+    order, _ = solve_order(durations, end="start")
+    assert (order[-2], order[-1]) != (1, 0)
+
+
+def test_rejects_unknown_end_mode():
+    with pytest.raises(ValueError):
+        solve_order(np.zeros((2, 2)), end="nearest")
+
+
+def test_empty_matrix():
+    assert solve_order(np.zeros((0, 0))) == ([], 0.0)
@@ -0,0 +1,129 @@
+"""Visit order for multi-stop trips.
+
+One duration matrix (a single OSRM ``table`` call) is enough to order the
+stops: a nearest-neighbour tour is improved with 2-opt and Or-opt moves until
+no move helps or the time budget runs out. All move gains are computed in
+O(1) from prefix sums, and they are exact for asymmetric matrices (one-way
+streets, motorway ramps), where reversing a segment changes its cost.
+"""
+import time
+
+import numpy as np
+
+# Einde van de rit: terug naar het startadres, het laatste adres, of vrij te kiezen
+END_MODES = ("start", "last", "free")
+DEFAULT_TIME_BUDGET_S = 2.0
+_EPS = 1e-9
+
+
+def _cost_matrix(durations):
+    cost = np.array(durations, dtype=np.float64)
+    unreachable = ~np.isfinite(cost)
+    np.fill_diagonal(unreachable, False)
+    if unreachable.any():
+        # Onbereikbare paren niet verbieden maar zo duur maken dat ze alleen als laatste redmiddel dienen;
+        # maximum over de echte ritten (buiten de diagonaal), met een positieve ondergrens
+        off_diagonal = ~np.eye(len(cost), dtype=bool)
+        finite = cost[off_diagonal & ~unreachable]
+        longest = max(float(finite.max()) if len(finite) else 0.0, 1.0)
+        cost[unreachable] = 10.0 * longest * len(cost)
+    np.fill_diagonal(cost, 0.0)
+    return cost
+
+
+def tour_cost(durations, order):
+    """Summed duration of visiting ``order`` (a list of matrix indices) in sequence."""
+    cost = _cost_matrix(durations)
+    return float(cost[order[:-1], order[1:]].sum()) if len(order) > 1 else 0.0
+
+
+def _nearest_neighbour(cost, start, free, end):
+    order = [start]
+    left = set(free)
+    while left:
+        row = cost[order[-1]]
+        nxt = min(left, key=row.__getitem__)
+        order.append(nxt)
+        left.discard(nxt)
+    if end is not None:
+        order.append(end)
+    return order
+
+
+def _two_opt(c, tour, last_movable):
+    """One pass of reversing ``tour[i..j]``; returns True when the tour changed."""
+    n = len(tour)
+    # fwd[k]: kosten van tour[0..k] heen, bwd[k]: van hetzelfde stuk in omgekeerde richting
+    fwd = [0.0] * n
+    bwd = [0.0] * n
+    for k in range(1, n):
+        fwd[k] = fwd[k - 1] + c[tour[k - 1]][tour[k]]
+        bwd[k] = bwd[k - 1] + c[tour[k]][tour[k - 1]]
+    for i in range(1, last_movable + 1):
+        a = tour[i - 1]
+        for j in range(i + 1, last_movable + 1):
+            after = c[tour[j]][tour[j + 1]] if j + 1 < n else 0.0
+            new_after = c[tour[i]][tour[j + 1]] if j + 1 < n else 0.0
+            old = c[a][tour[i]] + (fwd[j] - fwd[i]) + after
+            new = c[a][tour[j]] + (bwd[j] - bwd[i]) + new_after
+            if new < old - _EPS:
+                tour[i:j + 1] = tour[i:j + 1][::-1]
+                return True
+    return False
+
+
+def _or_opt(c, tour, last_movable):
+    """One pass of moving a run of 1-3 stops elsewhere; returns True when the tour changed."""
+    n = len(tour)
+    for length in (1, 2, 3):
+        for i in range(1, last_movable - length + 2):
+            j = i + length - 1
+            prev, first, last = tour[i - 1], tour[i], tour[j]
+            nxt = tour[j + 1] if j + 1 < n else None
+            removed = c[prev][first] + (c[last][nxt] if nxt is not None else 0.0) \
+                - (c[prev][nxt] if nxt is not None else 0.0)
+            # Invoegen tussen tour[p] en tour[p + 1], buiten het verplaatste stuk
+            for p in range(0, last_movable + 1):
+                if i - 1 <= p <= j:
+                    continue
+                a = tour[p]
+                b = tour[p + 1] if p + 1 < n else None
+                added = c[a][first] + (c[last][b] if b is not None else 0.0) - (c[a][b] if b is not None else 0.0)
+                if added < removed - _EPS:
+                    segment = tour[i:j + 1]
+                    del tour[i:j + 1]
+                    at = p + 1 if p < i else p + 1 - length
+                    tour[at:at] = segment
+                    return True
+    return False
+
+
+def solve_order(durations, end="free", time_budget_s=DEFAULT_TIME_BUDGET_S):
+    """Visit order for the points of an (n, n) duration matrix, starting at point 0.
+
+    ``end`` is ``"start"`` (round trip back to 0; the order ends with 0),
+    ``"last"`` (finish at point n - 1) or ``"free"``. Returns
+    ``(order, duration_s)`` with ``order`` a list of matrix indices. Unreachable
+    pairs (NaN, as OSRM reports them) are heavily penalized rather than
+    forbidden.
+    """
+    if end not in END_MODES:
+        raise ValueError("Onbekende eindmodus: {!r}".format(end))
+    cost = _cost_matrix(durations)
+    n = len(cost)
+    if n == 0:
+        return [], 0.0
+    deadline = time.perf_counter() + time_budget_s
+    if end == "start":
+        tour = _nearest_neighbour(cost, 0, range(1, n), 0)
+    elif end == "last" and n > 1:
+        tour = _nearest_neighbour(cost, 0, range(1, n - 1), n - 1)
+    else:
+        tour = _nearest_neighbour(cost, 0, range(1, n), None)
+    # Alleen posities 1..last_movable mogen verschuiven; start en een vast eindpunt blijven staan
+    last_movable = len(tour) - 1 if end == "free" else len(tour) - 2
+    c = cost.tolist()
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = _two_opt(c, tour, last_movable) or _or_opt(c, tour, last_movable)
+    return tour, float(cost[tour[:-1], tour[1:]].sum()) if len(tour) > 1 else 0.0